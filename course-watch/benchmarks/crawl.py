@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["requests"]
+# ///
+"""Indexer crawl benchmark against the local WebDAV stand-in.
+
+Starts davserver in this process on an ephemeral port and runs each scenario
+in a fresh interpreter, so its peak memory (max RSS above the interpreter's
+baseline) is its own and the server's work is not counted:
+
+  list         WebDAVClient.list() of one directory of --large files
+  depth1       generate() with a Depth: 1 listing per directory
+  bulk         generate() with a Depth: infinity listing per course
+  incremental  generate() again, reusing the bulk run's manifest
+  changed      a video is added to one section, then generate() again trusting
+               recursive ETags; the result must include the new video
+  refused      bulk against a server that refuses Depth: infinity
+  flaky        depth1 with --error-rate of requests answered with 503
+
+Requests are counted by the server, so retries are included. With --json the
+results are saved; with --compare they are checked against a saved run and
+the exit status is 1 if any scenario got slower than --tolerance allows or
+sent more requests.
+
+Usage:
+    uv run benchmarks/crawl.py [--courses 100] [--sections 10] [--files 100]
+                               [--latency-ms 5] [--workers 8] [--repeat 3]
+                               [--json out.json] [--compare baseline.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from davserver import DAVServer, SyntheticTree  # noqa: E402
+
+# name → (server settings, generate() options); "list" is handled apart
+SCENARIOS: dict[str, tuple[dict, dict]] = {
+    "list":        ({}, {}),
+    "depth1":      ({}, {"bulk": False, "incremental": False}),
+    "bulk":        ({}, {"bulk": True,  "incremental": False}),
+    "incremental": ({}, {"bulk": True,  "incremental": True}),
+    "changed":     ({"mutate": True}, {"bulk": True, "incremental": True,
+                                       "recursive_etags": True}),
+    "refused":     ({"deep": False}, {"bulk": True, "incremental": False}),
+    "flaky":       ({"error_rate": None}, {"bulk": False, "incremental": False}),
+}
+
+
+# ── Scenario (child process) ───────────────────────────────────────────────────
+
+def _max_rss() -> int:
+    """Peak resident set size of this process in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_scenario(name: str, url: str, out: Path, workers: int) -> dict:
+    sys.path.insert(0, str(HERE.parent))
+    import indexer
+
+    client = indexer.WebDAVClient(url, pool_size=workers, retries=5)
+    _, options = SCENARIOS[name]
+    base  = _max_rss()
+    start = time.perf_counter()
+    if name == "list":
+        items = len(client.list(url))
+    else:
+        data  = indexer.generate(client, url, out, workers=workers, **options)
+        items = indexer._counts(data)[2]
+    return {
+        "seconds": time.perf_counter() - start,
+        "items":   items,
+        "retried": client.retried,
+        "rss":     _max_rss() - base,
+    }
+
+
+# ── Driver ─────────────────────────────────────────────────────────────────────
+
+def _spawn(name: str, url: str, out: Path, workers: int) -> dict:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--run", name, "--url", url,
+         "--out", str(out), "--workers", str(workers)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise SystemExit(f"{name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout)
+
+
+def benchmark(args: argparse.Namespace) -> dict[str, dict]:
+    latency = args.latency_ms / 1000
+    tree  = DAVServer(SyntheticTree(args.courses, args.sections, args.files),
+                      latency=latency, seed=0).start()
+    large = DAVServer(SyntheticTree(1, 1, args.large), latency=latency).start()
+    large_url = large.url + quote("Course 0000 – Topic") + "/" + quote("00 Section") + "/"
+    print(f"tree: {tree.tree.size:,} files  large directory: {args.large:,} files  "
+          f"latency {args.latency_ms:g} ms  workers {args.workers}")
+
+    results: dict[str, dict] = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "courses.json"
+            for name in args.scenarios:
+                server = large if name == "list" else tree
+                settings, _ = SCENARIOS[name]
+                server.deep       = settings.get("deep", True)
+                server.error_rate = args.error_rate if "error_rate" in settings else 0.0
+                url = large_url if name == "list" else server.url
+
+                runs = []
+                for _ in range(args.repeat):
+                    if settings.get("mutate"):
+                        server.tree.mutate()
+                    before = server.requests
+                    run = _spawn(name, url, out, args.workers)
+                    run["requests"] = server.requests - before
+                    if settings.get("mutate") and run["items"] != server.tree.videos:
+                        raise SystemExit(f"{name}: found {run['items']:,} videos, "
+                                         f"expected {server.tree.videos:,}")
+                    runs.append(run)
+                results[name] = {
+                    "seconds":  statistics.median(r["seconds"] for r in runs),
+                    "requests": max(r["requests"] for r in runs),
+                    "retried":  max(r["retried"] for r in runs),
+                    "rss_mib":  max(r["rss"] for r in runs) / (1024 * 1024),
+                    "items":    runs[0]["items"],
+                }
+                _print(name, results[name])
+    finally:
+        tree.stop()
+        large.stop()
+    return results
+
+
+def _print(name: str, r: dict) -> None:
+    print(f"{name:<12} {r['seconds']:8.3f} s  {r['requests']:6d} requests "
+          f"({r['retried']} retried)  peak +{r['rss_mib']:6.1f} MiB  {r['items']:,} items")
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> bool:
+    """Print changes against baseline; False if any scenario regressed."""
+    ok = True
+    print(f"\nagainst baseline (tolerance {tolerance:.0%}):")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<12} no baseline")
+            continue
+        ratio  = r["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        slower = ratio > 1 + tolerance
+        more   = r["requests"] > base["requests"]
+        ok    &= not (slower or more)
+        flags  = ", ".join(f for f, bad in (("SLOWER", slower), ("MORE REQUESTS", more)) if bad)
+        print(f"{name:<12} time ×{ratio:5.2f}  requests {base['requests']} → {r['requests']}"
+              f"{'  ' + flags if flags else ''}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--courses",    type=int, default=100)
+    parser.add_argument("--sections",   type=int, default=10, help="per course")
+    parser.add_argument("--files",      type=int, default=100, help="per section")
+    parser.add_argument("--large",      type=int, default=20000,
+                        help="files in the directory the list scenario reads")
+    parser.add_argument("--latency-ms", type=float, default=5, help="added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="for the flaky scenario")
+    parser.add_argument("--workers",    type=int, default=8)
+    parser.add_argument("--repeat",     type=int, default=1, help="runs per scenario (median time)")
+    parser.add_argument("--scenario",   dest="scenarios", action="append",
+                        choices=list(SCENARIOS), help="run only these (repeatable)")
+    parser.add_argument("--json",       type=Path, help="save results here")
+    parser.add_argument("--compare",    type=Path, help="check against saved results")
+    parser.add_argument("--tolerance",  type=float, default=0.2,
+                        help="allowed slowdown against --compare (default 0.2)")
+    # Internal: run one scenario and print its measurements
+    parser.add_argument("--run",        help=argparse.SUPPRESS)
+    parser.add_argument("--url",        help=argparse.SUPPRESS)
+    parser.add_argument("--out",        type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_scenario(args.run, args.url, args.out, args.workers)))
+        return
+
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    results = benchmark(args)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        if not compare(results, json.loads(args.compare.read_text()), args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Local WebDAV stand-in serving a synthetic course tree.
+
+Answers PROPFIND (Depth 0, 1 and infinity) for a root / course / section /
+files tree generated from its shape, so the indexer can be exercised and
+measured without a NAS. Each request can be delayed (latency) and a share of
+them answered with 503 (error rate). Videos can be added while it runs; like
+Nextcloud, the ETag of every directory above the change changes with it.
+
+Usage:
+    python benchmarks/davserver.py [--port 8765] [--courses 300] [--sections 10]
+                                   [--files 100] [--latency-ms 20] [--error-rate 0.01]
+    uv run indexer.py http://127.0.0.1:8765/dav/courses/
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+PREFIX = "/dav/courses/"
+
+
+class SyntheticTree:
+    """A course tree described by its shape; listings are generated on demand.
+
+    Each section holds `files` entries: two videos, then a subtitle for the
+    second of them, repeated, followed by any videos added with mutate().
+    """
+
+    def __init__(self, courses: int, sections: int, files: int, prefix: str = PREFIX) -> None:
+        self.courses  = courses
+        self.sections = sections
+        self.files    = files
+        self.prefix   = prefix
+        self.added: dict[tuple[str, ...], int] = {}     # section path → videos added
+        self._version: dict[tuple[str, ...], int] = {}  # directory path → changes below it
+
+    @property
+    def size(self) -> int:
+        return self.courses * self.sections * self.files + sum(self.added.values())
+
+    @property
+    def videos(self) -> int:
+        per_section = self.files - (self.files + 1) // 3
+        return self.courses * self.sections * per_section + sum(self.added.values())
+
+    def mutate(self) -> list[str]:
+        """Add a video to the next section in turn and return that section's path."""
+        n    = sum(self.added.values())
+        path = [f"Course {n % self.courses:04d} – Topic",
+                f"{n // self.courses % self.sections:02d} Section"]
+        self.added[tuple(path)] = self.added.get(tuple(path), 0) + 1
+        for depth in range(len(path) + 1):
+            key = tuple(path[:depth])
+            self._version[key] = self._version.get(key, 0) + 1
+        return path
+
+    def children(self, path: list[str]) -> list[tuple[str, bool]]:
+        """(name, is_dir) below path, a list of decoded segments under prefix."""
+        if not path:
+            return [(f"Course {c:04d} – Topic", True) for c in range(self.courses)]
+        if len(path) == 1:
+            return [(f"{s:02d} Section", True) for s in range(self.sections)]
+        if len(path) == 2:
+            out = []
+            for v in range(self.files):
+                if v % 3 == 2:
+                    out.append((f"{v - 1:03d} lesson_name.en.srt", False))
+                else:
+                    out.append((f"{v:03d} lesson_name.mp4", False))
+            for v in range(self.added.get(tuple(path), 0)):
+                out.append((f"{self.files + v:03d} added_lesson.mp4", False))
+            return out
+        return []
+
+    def exists(self, path: list[str]) -> bool:
+        if len(path) > 2:
+            return False
+        for depth in range(len(path)):
+            if (path[depth], True) not in self.children(path[:depth]):
+                return False
+        return True
+
+    def split(self, url_path: str) -> list[str] | None:
+        """Decoded segments of url_path below prefix, or None if outside it."""
+        decoded = unquote(url_path)
+        if not (decoded + "/").startswith(self.prefix):
+            return None
+        rel = decoded[len(self.prefix):].strip("/")
+        return rel.split("/") if rel else []
+
+    def multistatus(self, path: list[str], depth: str) -> Iterator[bytes]:
+        yield b'<?xml version="1.0" encoding="utf-8"?><D:multistatus xmlns:D="DAV:">'
+        yield self._response(path, True)
+        if depth != "0":
+            yield from self._below(path, depth)
+        yield b"</D:multistatus>"
+
+    def _below(self, path: list[str], depth: str) -> Iterator[bytes]:
+        for name, is_dir in self.children(path):
+            yield self._response(path + [name], is_dir)
+            if is_dir and depth == "infinity":
+                yield from self._below(path + [name], depth)
+
+    def _response(self, path: list[str], is_dir: bool) -> bytes:
+        href = self.prefix + "".join(quote(p) + "/" for p in path)
+        if not is_dir:
+            href = href.rstrip("/")
+        kind = "<D:collection/>" if is_dir else ""
+        # A directory's ETag changes whenever anything below it does
+        version = self._version.get(tuple(path), 0) if is_dir else 0
+        etag = zlib.crc32(f"{href} {version}".encode())
+        return (
+            f"<D:response><D:href>{href}</D:href><D:propstat><D:prop>"
+            f"<D:resourcetype>{kind}</D:resourcetype>"
+            f'<D:getetag>"{etag:08x}"</D:getetag>'
+            f"<D:getlastmodified>Mon, 01 Jan 2024 00:00:00 GMT</D:getlastmodified>"
+            f"</D:prop><D:status>HTTP/1.1 200 OK</D:status></D:propstat></D:response>"
+        ).encode()
+
+
+class DAVServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        tree: SyntheticTree,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        deep: bool = True,
+        seed: int | None = None,
+    ) -> None:
+        self.tree       = tree
+        self.latency    = latency      # seconds added to every PROPFIND
+        self.error_rate = error_rate   # share of PROPFINDs answered with 503
+        self.deep       = deep         # False: refuse Depth: infinity with 403
+        self.requests   = 0
+        self.errors     = 0
+        self._random    = random.Random(seed)
+        self._lock      = threading.Lock()
+        self._thread: threading.Thread | None = None
+        super().__init__(address, _Handler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{self.tree.prefix}"
+
+    def start(self) -> DAVServer:
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def _admit(self) -> bool:
+        """Count a request; False if it should fail."""
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return False
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: DAVServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_PROPFIND(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        ok = self.server._admit()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not ok:
+            self._empty(503)
+            return
+
+        depth = self.headers.get("Depth", "infinity")
+        if depth == "infinity" and not self.server.deep:
+            self._empty(403)
+            return
+        path = self.server.tree.split(urlsplit(self.path).path)
+        if path is None or not self.server.tree.exists(path):
+            self._empty(404)
+            return
+
+        self.send_response(207)
+        self.send_header("Content-Type", 'application/xml; charset="utf-8"')
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        buf = bytearray()
+        for part in self.server.tree.multistatus(path, depth):
+            buf += part
+            if len(buf) >= 64 * 1024:
+                self._chunk(buf)
+        self._chunk(buf)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, buf: bytearray) -> None:
+        if buf:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(buf), bytes(buf)))
+            buf.clear()
+
+    def _empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host",       default="127.0.0.1")
+    parser.add_argument("--port",       type=int, default=8765)
+    parser.add_argument("--courses",    type=int, default=300)
+    parser.add_argument("--sections",   type=int, default=10, help="per course")
+    parser.add_argument("--files",      type=int, default=100, help="per section")
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every request")
+    parser.add_argument("--error-rate", type=float, default=0, help="share answered with 503")
+    parser.add_argument("--no-deep",    dest="deep", action="store_false",
+                        help="Refuse Depth: infinity requests")
+    args = parser.parse_args()
+
+    tree   = SyntheticTree(args.courses, args.sections, args.files)
+    server = DAVServer(tree, (args.host, args.port), latency=args.latency_ms / 1000,
+                       error_rate=args.error_rate, deep=args.deep)
+    print(f"Serving {tree.size:,} files at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.requests} requests, {server.errors} failed on purpose")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
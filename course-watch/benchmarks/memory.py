@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["requests"]
+# ///
+"""Indexer memory benchmark on a synthetic course tree.
+
+Serves PROPFIND responses for davserver's synthetic tree straight from memory
+(no network), then measures with tracemalloc (timings
+are inflated by tracing):
+
+  listings  bytes retained per Entry when every section listing is kept,
+            as the browser's listing cache does, next to the same listings
+            held as PlainEntry (the representation Entry replaced)
+  build     peak bytes while build_courses() crawls the whole tree
+
+Usage:
+    uv run benchmarks/memory.py [--courses 100] [--sections 10] [--files 100]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import indexer  # noqa: E402
+from davserver import PREFIX, SyntheticTree  # noqa: E402
+
+ROOT = "http://bench.invalid" + PREFIX
+
+
+@dataclass
+class PlainEntry:
+    """A listing entry as the indexer used to keep it: a full href of its own
+    and, for files too, the getlastmodified text as etag."""
+
+    name: str
+    href: str
+    is_dir: bool
+    etag: str = ""
+
+
+def _plain(entry: indexer.Entry) -> PlainEntry:
+    # The XML parser produced a separate string per entry; "".join() copies
+    etag = entry.etag or "".join(["Mon, 01 Jan 2024 ", "00:00:00 GMT"])
+    return PlainEntry(entry.name, entry.href, entry.is_dir, etag)
+
+
+class _Response:
+    """Just enough of requests.Response for WebDAVClient._parse()."""
+
+    def __init__(self, body: Iterator[bytes]) -> None:
+        self._body = body
+
+    def iter_content(self, size: int) -> Iterator[bytes]:
+        buf = bytearray()
+        for part in self._body:
+            buf += part
+            if len(buf) >= size:
+                yield bytes(buf)
+                buf.clear()
+        if buf:
+            yield bytes(buf)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> _Response:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class SyntheticClient(indexer.WebDAVClient):
+    def __init__(self, tree: SyntheticTree, **kwargs) -> None:
+        super().__init__(ROOT, **kwargs)
+        self.synthetic = tree
+
+    def _propfind(self, url: str, depth: str, timeout: float) -> _Response:
+        with self._lock:
+            self.requests += 1
+        path = self.synthetic.split(urlsplit(url).path)
+        return _Response(self.synthetic.multistatus(path, depth))
+
+
+def _measure(fn) -> tuple[object, int, int, float]:
+    """(result, bytes still allocated, peak bytes, seconds) for fn()."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--courses",  type=int, default=100)
+    parser.add_argument("--sections", type=int, default=10, help="per course")
+    parser.add_argument("--files",    type=int, default=100, help="per section")
+    args = parser.parse_args()
+
+    tree  = SyntheticTree(args.courses, args.sections, args.files)
+    mib   = 1024 * 1024
+    print(f"tree: {args.courses} courses × {args.sections} sections × {args.files} files "
+          f"= {tree.size:,} files")
+
+    def keep_listings(convert=None) -> list[list]:
+        client = SyntheticClient(tree)
+        kept = []
+        for course in client.list(ROOT):
+            for section in client.list(course.href):
+                listing = client.list(section.href)
+                kept.append([convert(e) for e in listing] if convert else listing)
+        return kept
+
+    per_entry = {}
+    for label, convert in (("Entry", None), ("PlainEntry", _plain)):
+        kept, current, peak, seconds = _measure(lambda: keep_listings(convert))
+        entries = sum(len(k) for k in kept)
+        per_entry[label] = current / entries
+        print(f"listings ({label}): {entries:,} entries  retained {current / mib:8.1f} MiB "
+              f"({current / entries:5.0f} B/entry)  peak {peak / mib:8.1f} MiB  "
+              f"{seconds:6.2f} s")
+        del kept
+    print(f"Entry keeps {per_entry['Entry'] / per_entry['PlainEntry']:.0%} of the bytes "
+          f"PlainEntry needs")
+
+    for bulk in (False, True):
+        client = SyntheticClient(tree)
+        data, current, peak, seconds = _measure(
+            lambda: indexer.build_courses(client, ROOT, workers=4, bulk=bulk))
+        videos = sum(len(s["videos"]) for c in data["courses"] for s in c["sections"])
+        print(f"build ({'bulk' if bulk else 'depth 1'}): {videos:,} videos  "
+              f"result {current / mib:8.1f} MiB  peak {peak / mib:8.1f} MiB  "
+              f"{client.requests} requests  {seconds:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
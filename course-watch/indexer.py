@@ -5,11 +5,13 @@
 # ///
 """Course Watch — WebDAV Indexer
 
-Browse a WebDAV server interactively and generate courses.json.
+Browse a WebDAV server interactively and generate courses.json, or generate
+it non-interactively (e.g. from cron) with the build command.
 Expects a 3-level hierarchy: root / course / section / video-files
 
 Usage:
-    uv run indexer.py <url> [--user USER] [--password PASS]
+    uv run indexer.py <url> [--user USER] [--password PASS] [--workers N]
+    uv run indexer.py build <url> [--output PATH] [--user USER] [--password PASS]
     python indexer.py http://nas/dav/ --user admin --password s3cr3t
 """
 
@@ -18,20 +20,37 @@ from __future__ import annotations
 import argparse
 import curses
 import json
+import os
+import random
 import sys
-from collections.abc import Callable
-from dataclasses import dataclass
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 from urllib.parse import urlparse, unquote
 from xml.etree import ElementTree as ET
 
 import requests
+from requests.adapters import HTTPAdapter
 
 # ── Constants ──────────────────────────────────────────────────────────────────
 
 VIDEO_EXT = frozenset({".mp4", ".mkv", ".avi", ".mov", ".webm", ".m4v", ".ts"})
 SUB_EXT   = frozenset({".srt", ".vtt", ".sub"})
 DAV_NS    = "DAV:"
+READ_SIZE = 64 * 1024   # PROPFIND response bytes fed to the XML parser at a time
+MANIFEST_VERSION = 2    # bump when the JSON built for a section changes shape
+CACHE_TTL = 300         # seconds a directory listing is reused while browsing
+WORKERS   = 8     # concurrent PROPFIND requests while building courses.json
+TIMEOUT   = 15    # seconds per Depth 1 PROPFIND; Depth: infinity gets four times as long
+RETRIES   = 3     # extra attempts after a timeout, dropped connection, 429 or 5xx
+BACKOFF   = 0.5   # seconds; attempt n waits a random time up to BACKOFF * 2**n …
+BACKOFF_CAP = 30  # … but never more than this (nor longer than a Retry-After of 60 s)
+CHECKPOINT_INTERVAL = 10  # seconds between saves of completed courses during a crawl
 
 # Color pair IDs
 _CH = 1   # header bar     (black on cyan)
@@ -43,11 +62,120 @@ _CS = 5   # status/loading  (yellow on default)
 
 # ── Data ───────────────────────────────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class Entry:
     name: str
-    href: str
+    base: str        # URL of the parent directory; one string shared by its entries
+    leaf: str        # last path segment as the server sent it (name itself if unquoted)
     is_dir: bool
+    etag: str = ""   # directories: getetag, else getlastmodified; always "" for files
+
+    @property
+    def href(self) -> str:
+        return self.base + self.leaf + ("/" if self.is_dir else "")
+
+
+@dataclass
+class Manifest:
+    """Directory fingerprints from the last run and the JSON built under them.
+
+    courses: {course path: {"etag": ..., "sections": {section path: {"etag": ..., "json": ...}}}}
+    Section order is listing order; "json" is None for sections without videos.
+    resume: courses already crawled by a run that did not finish, same shape.
+    """
+    root: str = ""
+    courses: dict[str, dict] = field(default_factory=dict)
+    resume:  dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path, root_url: str) -> Manifest:
+        """Read the manifest at path; empty if missing, unreadable or for another root."""
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(root=root_url)
+        if (not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION
+                or data.get("root") != root_url):
+            return cls(root=root_url)
+        return cls(root=root_url, courses=data.get("courses", {}), resume=data.get("resume", {}))
+
+    def save(self, path: Path) -> None:
+        data = {"version": MANIFEST_VERSION, "root": self.root, "courses": self.courses}
+        if self.resume:
+            data["resume"] = self.resume
+        _write_atomic(path, json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    @staticmethod
+    def path_for(courses_json: Path) -> Path:
+        """courses.json → courses.manifest.json in the same directory."""
+        return courses_json.with_suffix(".manifest.json")
+
+
+# ── Listing cache ──────────────────────────────────────────────────────────────
+
+class ListingCache:
+    """Directory listings keyed by _dir_key(), each reused for ttl seconds.
+
+    fetch() also collapses concurrent requests for the same directory, so a
+    background prefetch and the user opening that folder share one PROPFIND.
+    A ttl of 0 disables caching but keeps the de-duplication.
+    """
+
+    def __init__(self, ttl: float = 0) -> None:
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, list[Entry]]] = {}
+        self._loading: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list[Entry] | None:
+        with self._lock:
+            return self._get(key)
+
+    def put(self, key: str, entries: list[Entry]) -> None:
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, entries)
+
+    def fetch(self, key: str, load: Callable[[], list[Entry]]) -> list[Entry]:
+        """Return the cached listing, or wait for / run load() to get it."""
+        while True:
+            with self._lock:
+                if (entries := self._get(key)) is not None:
+                    return entries
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    break
+            event.wait()  # then use its result, or load ourselves if it failed
+
+        try:
+            entries = load()
+            self.put(key, entries)
+            return entries
+        finally:
+            with self._lock:
+                del self._loading[key]
+            event.set()
+
+    def loading(self, key: str) -> bool:
+        """True if key is cached or being fetched."""
+        with self._lock:
+            return key in self._loading or self._get(key) is not None
+
+    def invalidate(self, key: str) -> None:
+        """Forget key and every directory below it."""
+        with self._lock:
+            for k in [k for k in self._entries if k == key or k.startswith(key + "/")]:
+                del self._entries[k]
+
+    def _get(self, key: str) -> list[Entry] | None:
+        hit = self._entries.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        return hit[1]
 
 
 # ── WebDAV client ──────────────────────────────────────────────────────────────
@@ -56,71 +184,271 @@ class WebDAVError(Exception):
     pass
 
 
+class DepthRefused(WebDAVError):
+    """The server does not allow Depth: infinity PROPFIND requests."""
+
+
+class TransientError(WebDAVError):
+    """A failure worth retrying: timeout, dropped connection, 429 or 5xx."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HostLimiter:
+    """Caps concurrent requests and the request rate to each host.
+
+    concurrency 0 and rate 0 mean unlimited.
+    """
+
+    def __init__(self, concurrency: int = 0, rate: float = 0) -> None:
+        self.concurrency = concurrency
+        self.rate        = rate
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._next:  dict[str, float] = {}   # host -> earliest start of its next request
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        host = urlparse(url).netloc
+        with self._lock:
+            sem = None
+            if self.concurrency > 0:
+                sem = self._slots.setdefault(host, threading.BoundedSemaphore(self.concurrency))
+        if sem is not None:
+            sem.acquire()
+        try:
+            if self.rate > 0:
+                with self._lock:
+                    now   = time.monotonic()
+                    start = max(now, self._next.get(host, now))
+                    self._next[host] = start + 1 / self.rate
+                time.sleep(start - now)
+            yield
+        finally:
+            if sem is not None:
+                sem.release()
+
+
+def _dir_key(href: str) -> str:
+    """Decoded path of a directory URL (or absolute href), without trailing slash."""
+    return unquote(urlparse(href).path).rstrip("/")
+
+
 class WebDAVClient:
-    def __init__(self, base_url: str, user: str = "", password: str = "") -> None:
+    # Status codes servers use to turn down Depth: infinity (RFC 4918 §9.1)
+    _DEPTH_REFUSED = frozenset({400, 403, 501, 507})
+    # Overloaded, throttled or briefly unavailable: try again after a pause
+    _RETRY_STATUS  = frozenset({408, 429, 500, 502, 503, 504})
+
+    def __init__(self, base_url: str, user: str = "", password: str = "",
+                 pool_size: int = WORKERS, cache_ttl: float = 0,
+                 timeout: float = TIMEOUT, retries: int = RETRIES,
+                 limiter: HostLimiter | None = None) -> None:
         self.base_url = base_url
         self.session  = requests.Session()
         if user:
             self.session.auth = (user, password)
+        # One keep-alive connection per concurrent request
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Cleared the first time the server refuses a Depth: infinity listing
+        self.deep = True
+        self.timeout  = timeout
+        self.retries  = retries
+        self.limiter  = limiter or HostLimiter()
+        self.requests = 0   # PROPFIND requests sent
+        self.retried  = 0   # of which repeated after a transient failure
+        self._lock    = threading.Lock()
+        self.cache    = ListingCache(cache_ttl)
 
     def list(self, url: str) -> list[Entry]:
         url = url.rstrip("/") + "/"
+        base = _dir_key(url)
+        return self.cache.fetch(base, lambda: self._list(url, base))
+
+    def _list(self, url: str, base: str) -> list[Entry]:
+        return self._request(url, "1", lambda r: self._sorted(
+            e for path, e in self._parse(url, r) if path != base))
+
+    def tree(self, url: str) -> dict[str, list[Entry]]:
+        """List url and everything below it with one Depth: infinity PROPFIND.
+
+        Returns {directory path: entries} keyed by _dir_key(). Directories the
+        response does not cover are missing from the result, so callers list
+        them with list(). If the server refuses deep listings, this (and every
+        later call) falls back to a Depth 1 listing of url alone.
+        """
+        url = url.rstrip("/") + "/"
+        base = _dir_key(url)
+        if (cached := self._cached_tree(base)) is not None:
+            return cached
+        if self.deep:
+            try:
+                found = self._request(url, "infinity",
+                                      lambda r: self._tree(base, self._parse(url, r)))
+            except DepthRefused:
+                self.deep = False
+            else:
+                for key, entries in found.items():
+                    self.cache.put(key, entries)
+                return found
+        return {base: self.list(url)}
+
+    def _cached_tree(self, base: str) -> dict[str, list[Entry]] | None:
+        """base and its subdirectories from the cache, if all of them are there."""
+        if (listing := self.cache.get(base)) is None:
+            return None
+        found = {base: listing}
+        for e in listing:
+            if e.is_dir:
+                if (sub := self.cache.get(_dir_key(e.href))) is None:
+                    return None
+                found[_dir_key(e.href)] = sub
+        return found
+
+    def _request(self, url: str, depth: str, consume: Callable[[requests.Response], object]):
+        """PROPFIND url and return consume(response), retrying transient failures
+        (including ones while the body streams in) with jittered exponential backoff."""
+        timeout = self.timeout * (4 if depth == "infinity" else 1)
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.slot(url):
+                    with self._propfind(url, depth, timeout) as r:
+                        return consume(r)
+            except TransientError as e:
+                if attempt >= self.retries:
+                    raise
+                if e.retry_after is not None:
+                    delay = min(e.retry_after, 60)
+                else:
+                    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF * 2 ** attempt))
+                attempt += 1
+                with self._lock:
+                    self.retried += 1
+                time.sleep(delay)
+
+    def _propfind(self, url: str, depth: str, timeout: float) -> requests.Response:
         headers = {
-            "Depth": "1",
+            "Depth": depth,
             "Content-Type": 'application/xml; charset="utf-8"',
         }
         body = (
             '<?xml version="1.0" encoding="utf-8"?>'
             '<D:propfind xmlns:D="DAV:">'
-            "<D:prop><D:resourcetype/><D:displayname/></D:prop>"
+            "<D:prop><D:resourcetype/><D:displayname/>"
+            "<D:getetag/><D:getlastmodified/></D:prop>"
             "</D:propfind>"
         )
+        with self._lock:
+            self.requests += 1
         try:
-            r = self.session.request("PROPFIND", url, headers=headers, data=body, timeout=15)
+            r = self.session.request("PROPFIND", url, headers=headers, data=body,
+                                     timeout=timeout, stream=True)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransientError(str(e)) from e
         except requests.RequestException as e:
             raise WebDAVError(str(e)) from e
 
-        if r.status_code == 401:
-            raise WebDAVError("Authentication failed (HTTP 401)")
         if r.status_code not in (207, 200):
+            r.close()
+            if r.status_code == 401:
+                raise WebDAVError("Authentication failed (HTTP 401)")
+            if depth == "infinity" and r.status_code in self._DEPTH_REFUSED:
+                raise DepthRefused(f"HTTP {r.status_code}: {r.reason}")
+            if r.status_code in self._RETRY_STATUS:
+                retry_after = r.headers.get("Retry-After", "")
+                raise TransientError(f"HTTP {r.status_code}: {r.reason}",
+                                     float(retry_after) if retry_after.isdigit() else None)
             raise WebDAVError(f"HTTP {r.status_code}: {r.reason}")
+        return r
 
-        return self._parse(url, r.text)
+    def _parse(self, base_url: str, r: requests.Response) -> Iterator[tuple[str, Entry]]:
+        """Yield (decoded path, entry) for every <D:response>, including base_url,
+        as soon as it has been received. Parsed elements are discarded as we go."""
+        parsed_base = urlparse(base_url)
+        origin      = f"{parsed_base.scheme}://{parsed_base.netloc}"
+        response    = f"{{{DAV_NS}}}response"
+        parser      = ET.XMLPullParser(events=("start", "end"))
+        root: ET.Element | None = None
+        bases: dict[str, str] = {}   # parent path -> the Entry.base all its children share
 
-    def _parse(self, base_url: str, xml_text: str) -> list[Entry]:
-        try:
-            root = ET.fromstring(xml_text)
-        except ET.ParseError as e:
-            raise WebDAVError(f"Malformed XML: {e}") from e
+        for chunk in self._chunks(r):
+            try:
+                parser.feed(chunk)
+                events = list(parser.read_events())
+            except ET.ParseError as e:
+                raise WebDAVError(f"Malformed XML: {e}") from e
+
+            for event, el in events:
+                if event == "start":
+                    if root is None:
+                        root = el
+                    continue
+                if el.tag != response:
+                    continue
 
-        base_path   = urlparse(base_url).path.rstrip("/")
-        parsed_base = urlparse(base_url)
-        entries: list[Entry] = []
+                href_el = el.find(f"{{{DAV_NS}}}href")
+                if href_el is not None and href_el.text:
+                    href_path = urlparse(href_el.text.strip()).path.rstrip("/")
+                    is_dir    = el.find(f".//{{{DAV_NS}}}collection") is not None
+                    etag      = ""
+                    if is_dir:
+                        etag = (el.findtext(f".//{{{DAV_NS}}}getetag")
+                                or el.findtext(f".//{{{DAV_NS}}}getlastmodified") or "").strip()
 
-        for resp in root.findall(f"{{{DAV_NS}}}response"):
-            href_el = resp.find(f"{{{DAV_NS}}}href")
-            if href_el is None or not href_el.text:
-                continue
+                    parent, _, leaf = href_path.rpartition("/")
+                    if (base := bases.get(parent)) is None:
+                        base = bases[parent] = origin + parent + "/"
+                    name = unquote(leaf)   # the same object as leaf when nothing is quoted
 
-            raw_path = unquote(href_el.text).rstrip("/")
-            if raw_path == base_path:
-                continue  # skip the directory itself
+                    yield unquote(href_path), Entry(name=name, base=base, leaf=leaf,
+                                                    is_dir=is_dir, etag=etag)
 
-            is_dir = resp.find(f".//{{{DAV_NS}}}collection") is not None
+                # Drop the finished response so the tree never grows
+                el.clear()
+                if root is not None and len(root) and root[0] is el:
+                    del root[0]
 
-            full_url = (
-                f"{parsed_base.scheme}://{parsed_base.netloc}"
-                + href_el.text.rstrip("/")
-            )
-            if is_dir:
-                full_url += "/"
+        try:
+            parser.close()
+        except ET.ParseError as e:
+            raise WebDAVError(f"Malformed XML: {e}") from e
 
-            name = unquote(raw_path.split("/")[-1])
-            entries.append(Entry(name=name, href=full_url, is_dir=is_dir))
+    @staticmethod
+    def _chunks(r: requests.Response) -> Iterator[bytes]:
+        try:
+            yield from r.iter_content(READ_SIZE)
+        except requests.RequestException as e:
+            raise TransientError(str(e)) from e
 
+    @staticmethod
+    def _sorted(entries) -> list[Entry]:
         # Directories first, then files — each group alphabetically
-        entries.sort(key=lambda e: (not e.is_dir, e.name.lower()))
-        return entries
+        return sorted(entries, key=lambda e: (not e.is_dir, e.name.lower()))
+
+    def _tree(self, base: str, found: Iterable[tuple[str, Entry]]) -> dict[str, list[Entry]]:
+        """Group a deep listing by parent directory."""
+        children: dict[str, list[Entry]] = {base: []}
+        nested = False
+        for path, entry in found:
+            if path == base or not path.startswith(base + "/"):
+                continue
+            if entry.is_dir:
+                children.setdefault(path, [])
+            parent = path.rpartition("/")[0]
+            nested = nested or parent != base
+            children.setdefault(parent, []).append(entry)
+
+        if not nested:
+            # Nothing below the first level: either the subdirectories are all
+            # empty or the server quietly answered with Depth 1. Only the base
+            # listing is certain.
+            children = {base: children[base]}
+        return {path: self._sorted(entries) for path, entries in children.items()}
 
 
 # ── courses.json builder ───────────────────────────────────────────────────────
@@ -143,79 +471,316 @@ def _relative(href: str, root_url: str) -> str:
     return href  # fallback: return full URL if paths don't match
 
 
-def _find_subtitle(video_stem: str, sub_files: list[Entry]) -> str | None:
-    """Find the best subtitle file for a given video stem.
+class SubtitleIndex:
+    """The subtitle files of one section, indexed by video stem in one pass.
 
-    Matches (in priority order):
-      exact:   video.srt  / video.sub  / video.vtt
+    Matches for stem "video" (exact before prefixed):
+      exact:    video.srt  / video.sub  / video.vtt
       prefixed: video.en.srt / video.en.us.srt / video.forced.srt
+    A prefixed file matches every stem it starts with: video.en.us.srt is
+    also the "us" track of a video named video.en.
     """
-    exact: str | None   = None
-    prefix: str | None  = None
-    for f in sub_files:
-        if Path(f.name).suffix.lower() not in SUB_EXT:
+
+    def __init__(self, sub_files: Iterable[Entry]) -> None:
+        self._exact:    dict[str, list[Entry]] = {}
+        self._prefixed: dict[str, list[tuple[str, Entry]]] = {}
+        for f in sub_files:
+            base = os.path.splitext(f.name)[0]   # "video.en.srt" → "video.en"
+            self._exact.setdefault(base, []).append(f)
+            dot = base.find(".")
+            while dot > 0:
+                self._prefixed.setdefault(base[:dot], []).append((base[dot + 1:], f))
+                dot = base.find(".", dot + 1)
+
+    def tracks(self, stem: str) -> list[tuple[str, Entry]]:
+        """(language, file) of every track: exact matches (language "") first,
+        then prefixed ones in listing order."""
+        return ([("", f) for f in self._exact.get(stem, ())]
+                + self._prefixed.get(stem, []))
+
+    def best(self, stem: str) -> Entry | None:
+        """The track to show by default: the last exact match, else the first prefixed."""
+        if exact := self._exact.get(stem):
+            return exact[-1]
+        if prefixed := self._prefixed.get(stem):
+            return prefixed[0][1]
+        return None
+
+
+def _scan_section(client: WebDAVClient, section_entry: Entry, root_url: str) -> dict | None:
+    """List one section directory and build its JSON, or None if it has no videos."""
+    return _section(section_entry.name, client.list(section_entry.href), root_url)
+
+
+def _section(name: str, listing: list[Entry], root_url: str) -> dict | None:
+    # Two passes over the listing instead of copying it into per-type lists:
+    # subtitles must all be indexed before the first video is matched.
+    subs = SubtitleIndex(
+        f for f in listing
+        if not f.is_dir and os.path.splitext(f.name)[1].lower() in SUB_EXT
+    )
+    relative: dict[str, str] = {}   # Entry.base -> its path relative to root_url
+
+    def rel(f: Entry) -> str:
+        if (prefix := relative.get(f.base)) is None:
+            prefix = relative[f.base] = _relative(f.base, root_url)
+        if prefix == f.base:
+            return _relative(f.href, root_url)  # outside root_url: keep the full URL
+        return prefix + f.name
+
+    videos = []
+    for f in listing:
+        if f.is_dir:
+            continue
+        stem, ext = os.path.splitext(f.name)
+        if ext.lower() not in VIDEO_EXT:
             continue
-        base = Path(f.name).stem   # "video.en.srt" → "video.en"
-        if base == video_stem:
-            exact = f.href
-        elif prefix is None and base.startswith(video_stem + "."):
-            prefix = f.href
-    return exact or prefix
+        entry: dict = {"title": _humanise(stem), "video": rel(f)}
+        if sub := subs.best(stem):
+            entry["sub"] = rel(sub)
+            tracks = subs.tracks(stem)
+            if len(tracks) > 1:
+                entry["subtitles"] = [{"lang": lang, "src": rel(t)} for lang, t in tracks]
+        videos.append(entry)
+
+    if not videos:
+        return None
+    return {"name": name, "videos": videos}
 
 
 def build_courses(
     client: WebDAVClient,
     root_url: str,
     on_progress: Callable[[str, int, int], None] | None = None,
+    workers: int = WORKERS,
+    bulk: bool = True,
+    manifest: Manifest | None = None,
+    recursive_etags: bool = False,
+    checkpoint: Callable[[], None] | None = None,
 ) -> dict:
     """Traverse root → courses → sections → videos and build the JSON structure.
 
-    on_progress(label, current, total) is called before each course is scanned.
+    Up to `workers` directory listings run concurrently. Course and section
+    order follows the listings, so the result does not depend on timing.
+
+    With bulk, each new course is fetched with a single Depth: infinity
+    PROPFIND; sections the server did not return are listed one by one.
+
+    With a manifest from the previous run, sections whose ETag is unchanged
+    are not listed again: a directory's ETag/Last-Modified changes whenever
+    an entry is added, removed or renamed in it. Only when the server's ETags
+    also change for anything deeper (recursive_etags, e.g. Nextcloud) are
+    unchanged courses skipped without listing them. The manifest is updated
+    in place to describe the result.
+
+    Completed courses are recorded in manifest.resume, and checkpoint() is
+    called to persist them every CHECKPOINT_INTERVAL seconds and when the
+    crawl fails. The next run treats them like the previous run's courses,
+    reusing each unchanged section, and so continues where this one stopped.
+
+    on_progress(label, done, total) is called once before scanning and after
+    each course completes, always from the calling thread.
     """
+    previous = manifest.courses if manifest is not None else {}
+    resume   = manifest.resume if manifest is not None else {}
+
     # Pre-fetch course list so we know the total for the progress bar.
     all_course_entries = [e for e in client.list(root_url) if e.is_dir]
-    total   = len(all_course_entries)
-    courses = []
-
-    for i, course_entry in enumerate(all_course_entries):
+    total = len(all_course_entries)
+    course_keys = {_dir_key(e.href) for e in all_course_entries}
+    if on_progress:
+        on_progress("", 0, total)
+
+    # Per course: its section directories, and the JSON of each (None: no videos)
+    section_entries: list[list[Entry]] = [[] for _ in range(total)]
+    sections: list[list[dict | None]] = [[] for _ in range(total)]
+    pending:  list[int] = [0] * total            # listings still running per course
+    finished_courses: list[dict | None] = [None] * total  # manifest entry once complete
+    done = 0
+    saved_at = time.monotonic()
+
+    def save_progress() -> None:
+        nonlocal saved_at
+        if manifest is None or checkpoint is None:
+            return
+        # Keep what earlier interrupted runs saved, unless the course is gone
+        # or has been crawled again since
+        progress = {key: entry for key, entry in resume.items() if key in course_keys}
+        progress.update(
+            (_dir_key(e.href), entry)
+            for e, entry in zip(all_course_entries, finished_courses) if entry is not None
+        )
+        manifest.resume = progress
+        checkpoint()
+        saved_at = time.monotonic()
+
+    def course_done(i: int, entry: dict | None = None) -> None:
+        nonlocal done
+        if entry is None:
+            entry = {"etag": all_course_entries[i].etag, "sections": {
+                _dir_key(e.href): {"etag": e.etag, "json": json_}
+                for e, json_ in zip(section_entries[i], sections[i])
+            }}
+        finished_courses[i] = entry
+        done += 1
         if on_progress:
-            on_progress(course_entry.name, i, total)
+            on_progress(all_course_entries[i].name, done, total)
+        if time.monotonic() - saved_at >= CHECKPOINT_INTERVAL:
+            save_progress()
 
-        sections = []
-        for section_entry in client.list(course_entry.href):
-            if not section_entry.is_dir:
-                continue
+    def list_course(url: str, deep: bool) -> dict[str, list[Entry]]:
+        return client.tree(url) if deep else {_dir_key(url): client.list(url)}
 
-            all_files = [f for f in client.list(section_entry.href) if not f.is_dir]
-            sub_files = [f for f in all_files if Path(f.name).suffix.lower() in SUB_EXT]
+    def last_crawl(course_key: str) -> dict | None:
+        # An interrupted run's copy of a course is newer than the last complete one
+        return resume.get(course_key) or previous.get(course_key)
 
-            videos = []
-            for f in all_files:
-                if Path(f.name).suffix.lower() not in VIDEO_EXT:
-                    continue
-                stem       = Path(f.name).stem
-                video_path = _relative(f.href, root_url)
-                entry: dict = {"title": _humanise(stem), "video": video_path}
-                sub_href = _find_subtitle(stem, sub_files)
-                if sub_href:
-                    entry["sub"] = _relative(sub_href, root_url)
-                videos.append(entry)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running: dict[Future, tuple[int, int]] = {}
+        to_list: list[int] = []
+        try:
+            for i, course_entry in enumerate(all_course_entries):
+                known = last_crawl(_dir_key(course_entry.href))
+                if (recursive_etags and known and course_entry.etag
+                        and known["etag"] == course_entry.etag):
+                    course_done(i, known)
+                else:
+                    to_list.append(i)
+
+            # Only `workers` course listings are queued at a time, so the sections
+            # of listed courses run first and courses complete roughly in order.
+            queue = iter(to_list)
+
+            def list_next_course() -> None:
+                if (i := next(queue, None)) is None:
+                    return
+                course_entry = all_course_entries[i]
+                # A known course usually has few changed sections: list it shallowly
+                deep = bulk and last_crawl(_dir_key(course_entry.href)) is None
+                running[pool.submit(list_course, course_entry.href, deep)] = (i, -1)
+                pending[i] = 1
+
+            for _ in range(max(1, workers)):
+                list_next_course()
+
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i, j = running.pop(fut)
+                    pending[i] -= 1
+                    if j >= 0:
+                        sections[i][j] = fut.result()
+                    else:
+                        tree = fut.result()
+                        course_key = _dir_key(all_course_entries[i].href)
+                        known = (last_crawl(course_key) or {}).get("sections", {})
+                        section_entries[i] = [e for e in tree[course_key] if e.is_dir]
+                        sections[i] = [None] * len(section_entries[i])
+                        for j, section_entry in enumerate(section_entries[i]):
+                            key  = _dir_key(section_entry.href)
+                            last = known.get(key)
+                            if last and section_entry.etag and last["etag"] == section_entry.etag:
+                                sections[i][j] = last["json"]
+                            elif (listing := tree.get(key)) is not None:
+                                sections[i][j] = _section(section_entry.name, listing, root_url)
+                            else:
+                                running[pool.submit(_scan_section, client, section_entry,
+                                                    root_url)] = (i, j)
+                                pending[i] += 1
+                        list_next_course()
+                    if pending[i] == 0:
+                        course_done(i)
+        except BaseException:
+            for fut in running:
+                fut.cancel()
+            save_progress()
+            raise
 
-            if videos:
-                sections.append({"name": section_entry.name, "videos": videos})
+    courses = []
+    fingerprints: dict[str, dict] = {}
+    for course_entry, entry in zip(all_course_entries, finished_courses):
+        fingerprints[_dir_key(course_entry.href)] = entry
+        found = [s["json"] for s in entry["sections"].values() if s["json"] is not None]
+        if found:
+            courses.append({"name": course_entry.name, "sections": found})
+
+    if manifest is not None:
+        manifest.root    = root_url
+        manifest.courses = fingerprints
+        manifest.resume  = {}
+    return {"courses": courses}
 
-        if sections:
-            courses.append({"name": course_entry.name, "sections": sections})
 
-    return {"courses": courses}
+def _write_atomic(path: Path, text: str) -> None:
+    """Replace path with text so readers see either the old or the new file."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def generate(
+    client: WebDAVClient,
+    root_url: str,
+    out: Path,
+    on_progress: Callable[[str, int, int], None] | None = None,
+    incremental: bool = True,
+    **options,
+) -> dict:
+    """Build courses.json for root_url and atomically write it, with its manifest, to out.
+
+    options are passed on to build_courses(). If the crawl fails, the courses
+    completed so far are kept in the manifest and the next call resumes from them.
+    """
+    manifest_path = Manifest.path_for(out)
+    if incremental:
+        manifest = Manifest.load(manifest_path, root_url)
+    else:
+        manifest = Manifest(root=root_url)
+    data = build_courses(client, root_url, on_progress=on_progress, manifest=manifest,
+                         checkpoint=lambda: manifest.save(manifest_path), **options)
+    _write_atomic(out, json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+    manifest.save(manifest_path)
+    return data
+
+
+def _counts(data: dict) -> tuple[int, int, int]:
+    """(courses, sections, videos) in a courses.json document."""
+    nc = len(data["courses"])
+    ns = sum(len(c["sections"]) for c in data["courses"])
+    nv = sum(len(s["videos"])   for c in data["courses"] for s in c["sections"])
+    return nc, ns, nv
 
 
 # ── TUI ────────────────────────────────────────────────────────────────────────
 
 class Browser:
-    def __init__(self, client: WebDAVClient, start_url: str) -> None:
+    def __init__(self, client: WebDAVClient, start_url: str, workers: int = WORKERS,
+                 bulk: bool = True, incremental: bool = True,
+                 recursive_etags: bool = False) -> None:
         self.client    = client
         self.url       = start_url
+        self.workers   = workers
+        self.bulk      = bulk
+        self.incremental     = incremental
+        self.recursive_etags = recursive_etags
+        # Lists the highlighted folder in the background; only the newest request matters
+        self._prefetcher = ThreadPoolExecutor(max_workers=2)
+        self._prefetching: Future | None = None
         self.entries:  list[Entry] = []
         self.sel       = 0
         self._offset   = 0
@@ -227,7 +792,10 @@ class Browser:
     # ── Public ────────────────────────────────────────────────────────────────
 
     def run(self) -> Path | None:
-        return curses.wrapper(self._loop)
+        try:
+            return curses.wrapper(self._loop)
+        finally:
+            self._prefetcher.shutdown(wait=False, cancel_futures=True)
 
     # ── Internals ─────────────────────────────────────────────────────────────
 
@@ -237,6 +805,7 @@ class Browser:
         self._load(self.url)
 
         while True:
+            self._prefetch()
             h, w = scr.getmaxyx()
             scr.erase()
             self._draw(scr, h, w)
@@ -261,6 +830,10 @@ class Browser:
                 if self.sel < len(self.entries) - 1:
                     self.sel += 1
 
+            elif key == ord("r"):
+                self.client.cache.invalidate(_dir_key(self.url))
+                self._load(self.url, keep_position=True)
+
             elif key in (curses.KEY_ENTER, 10, 13, curses.KEY_RIGHT):
                 if self.entries and self.entries[self.sel].is_dir:
                     self._stack.append((self.url, self.entries, self.sel, self._offset))
@@ -272,19 +845,39 @@ class Browser:
                 if result is not None:
                     return result
 
-    def _load(self, url: str) -> None:
+    def _load(self, url: str, keep_position: bool = False) -> None:
         self.msg = "Loading…"
         self.is_error = False
         try:
             self.entries = self.client.list(url)
             self.url     = url
-            self.sel     = 0
-            self._offset = 0
+            if keep_position:
+                self.sel = min(self.sel, max(0, len(self.entries) - 1))
+            else:
+                self.sel     = 0
+                self._offset = 0
             self.msg     = ""
         except WebDAVError as e:
             self.is_error = True
             self.msg      = str(e)
 
+    def _prefetch(self) -> None:
+        """List the highlighted folder in the background so opening it is instant."""
+        if self.client.cache.ttl <= 0 or not self.entries or not self.entries[self.sel].is_dir:
+            return
+        href = self.entries[self.sel].href
+        if self.client.cache.loading(_dir_key(href)):
+            return
+        if self._prefetching is not None:
+            self._prefetching.cancel()  # still queued: the cursor has moved on
+        self._prefetching = self._prefetcher.submit(self._prefetch_one, href)
+
+    def _prefetch_one(self, href: str) -> None:
+        try:
+            self.client.list(href)
+        except WebDAVError:
+            pass  # reported if the user actually opens it
+
     def _generate(self, scr) -> Path | None:
         _, w = scr.getmaxyx()
 
@@ -310,13 +903,11 @@ class Browser:
         scr.refresh()
 
         try:
-            data = build_courses(self.client, self.url, on_progress=draw_progress)
             out  = Path(__file__).with_name("courses.json")
-            out.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
-
-            nc = len(data["courses"])
-            ns = sum(len(c["sections"]) for c in data["courses"])
-            nv = sum(len(s["videos"])   for c in data["courses"] for s in c["sections"])
+            data = generate(self.client, self.url, out, on_progress=draw_progress,
+                            incremental=self.incremental, workers=self.workers,
+                            bulk=self.bulk, recursive_etags=self.recursive_etags)
+            nc, ns, nv = _counts(data)
 
             redraw_header()
             bar_w = max(10, w - 16)
@@ -403,7 +994,7 @@ class Browser:
 
         # ── Footer ────────────────────────────────────────────────────────────
         footer = (
-            " ↑↓ move   →/Enter: open   ←/Esc: back   g: generate courses.json   q: quit "
+            " ↑↓ move   →/Enter: open   ←/Esc: back   r: refresh   g: generate courses.json   q: quit "
         )
         try:
             scr.addstr(h - 1, 0, footer.ljust(w)[:w], curses.color_pair(_CH))
@@ -422,7 +1013,34 @@ class Browser:
 
 # ── Entry point ────────────────────────────────────────────────────────────────
 
-def main() -> None:
+_COMMANDS = ("browse", "build")
+
+
+def main(argv: list[str] | None = None) -> None:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("url",                        help="WebDAV base URL")
+    common.add_argument("--user",     "-u", default="", help="Username")
+    common.add_argument("--password", "-p", default="", help="Password")
+    common.add_argument("--workers",  "-w", type=int, default=WORKERS,
+                        help=f"Concurrent WebDAV requests while generating (default {WORKERS})")
+    common.add_argument("--no-bulk", dest="bulk", action="store_false",
+                        help="List one directory per request instead of one Depth: infinity "
+                             "request per course")
+    common.add_argument("--full", dest="incremental", action="store_false",
+                        help="Ignore courses.manifest.json and list every directory again")
+    common.add_argument("--recursive-etags", action="store_true",
+                        help="Directory ETags change when anything below them changes "
+                             "(Nextcloud, ownCloud): skip unchanged courses without listing them")
+    common.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help=f"Seconds to wait for a folder listing (default {TIMEOUT})")
+    common.add_argument("--retries", type=int, default=RETRIES,
+                        help="Retries after a timeout, dropped connection, 429 or 5xx, "
+                             f"with jittered exponential backoff (default {RETRIES})")
+    common.add_argument("--per-host", type=int, default=0, metavar="N",
+                        help="At most N requests in flight to one server (default: unlimited)")
+    common.add_argument("--rate", type=float, default=0, metavar="R",
+                        help="At most R requests per second to one server (default: unlimited)")
+
     parser = argparse.ArgumentParser(
         prog="indexer",
         description="Browse a WebDAV server and generate courses.json for Course Watch",
@@ -432,15 +1050,44 @@ examples:
   uv run indexer.py https://nas.local/dav/ --user admin --password secret
   python indexer.py http://localhost:8080/webdav/
   uv run indexer.py https://files.example.com/ -u bob -p hunter2
+  uv run indexer.py https://nas.local/dav/ -u admin -p secret --workers 16
+  uv run indexer.py build https://nas.local/dav/ -u admin -p secret \\
+      --output /share/course-watch/courses.json
         """,
     )
-    parser.add_argument("url",                        help="WebDAV base URL")
-    parser.add_argument("--user",     "-u", default="", help="Username")
-    parser.add_argument("--password", "-p", default="", help="Password")
-    args = parser.parse_args()
+    commands = parser.add_subparsers(dest="command", metavar="{browse,build}")
+    browse = commands.add_parser("browse", parents=[common],
+                                 help="Browse interactively and press g to generate (default)")
+    browse.add_argument("--cache-ttl", type=float, default=CACHE_TTL,
+                        help=f"Seconds to reuse a folder listing, 0 to disable (default {CACHE_TTL})")
+    build = commands.add_parser(
+        "build", parents=[common],
+        help="Generate courses.json without a terminal UI",
+        description="Generate courses.json and print one line of JSON stats to stdout",
+    )
+    build.add_argument("--output", "-o", type=Path,
+                       default=Path(__file__).with_name("courses.json"),
+                       help="Where to write courses.json (default: next to indexer.py)")
+
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] not in (*_COMMANDS, "-h", "--help"):
+        argv = ["browse", *argv]  # `indexer.py <url>` opens the browser as before
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("a WebDAV URL is required")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.retries < 0 or args.per_host < 0 or args.rate < 0 or args.timeout <= 0:
+        parser.error("--retries, --per-host and --rate must not be negative, "
+                     "--timeout must be positive")
 
     url    = args.url if args.url.endswith("/") else args.url + "/"
-    client = WebDAVClient(url, args.user, args.password)
+    client = WebDAVClient(url, args.user, args.password, pool_size=args.workers,
+                          cache_ttl=getattr(args, "cache_ttl", 0), timeout=args.timeout,
+                          retries=args.retries, limiter=HostLimiter(args.per_host, args.rate))
+
+    if args.command == "build":
+        sys.exit(_build(client, url, args))
 
     print(f"Connecting to {url} … ", end="", flush=True)
     try:
@@ -451,7 +1098,9 @@ examples:
         sys.exit(1)
 
     try:
-        result = Browser(client, url).run()
+        result = Browser(client, url, workers=args.workers, bulk=args.bulk,
+                         incremental=args.incremental,
+                         recursive_etags=args.recursive_etags).run()
     except KeyboardInterrupt:
         sys.exit(0)
 
@@ -459,5 +1108,31 @@ examples:
         print(f"\nSaved: {result}")
 
 
+def _build(client: WebDAVClient, url: str, args: argparse.Namespace) -> int:
+    """The build command: returns the process exit status."""
+    out   = args.output.expanduser().resolve()
+    start = time.monotonic()
+    try:
+        data = generate(client, url, out, incremental=args.incremental, workers=args.workers,
+                        bulk=args.bulk, recursive_etags=args.recursive_etags)
+    except (WebDAVError, OSError) as e:
+        print(f"indexer: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    nc, ns, nv = _counts(data)
+    print(json.dumps({
+        "output":   str(out),
+        "courses":  nc,
+        "sections": ns,
+        "videos":   nv,
+        "requests": client.requests,
+        "retries":  client.retried,
+        "seconds":  round(time.monotonic() - start, 3),
+    }))
+    return 0
+
+
 if __name__ == "__main__":
     main()
@@ -3,6 +3,15 @@
 export WEBDAV_USER=$(bashio::config 'webdav_user')
 export WEBDAV_PASS=$(bashio::config 'webdav_password')
 export MEDIA_URL=$(bashio::config 'media_url')
+export WORKERS=$(bashio::config 'workers' 16)
+export MAX_STREAMS=$(bashio::config 'max_streams' 8)
+export POOL_SIZE=$(bashio::config 'pool_size' 4)
+export POOL_IDLE=$(bashio::config 'pool_idle_timeout' 30)
+export CACHE_SIZE_MB=$(bashio::config 'cache_size_mb' 2048)
+export CACHE_DIR=/data/cache
+export READAHEAD_MB=$(bashio::config 'readahead_mb' 16)
+export PREFETCH_NEXT_MB=$(bashio::config 'prefetch_next_mb' 4)
+export META_TTL=$(bashio::config 'metadata_ttl' 300)
 export PORT=8099
 export COURSES_JSON=/share/course-watch/courses.json
 
@@ -15,8 +24,9 @@ else
 fi
 
 bashio::log.info "Courses file: ${COURSES_JSON}"
+bashio::log.info "Video cache: ${CACHE_DIR} (${CACHE_SIZE_MB} MiB)"
 bashio::log.info "Web UI available on port ${PORT}"
 
-mkdir -p /share/course-watch
+mkdir -p /share/course-watch "${CACHE_DIR}"
 
 exec python3 /app/server.py
@@ -1,15 +1,59 @@
 #!/usr/bin/env python3
 import base64
+import bisect
+import contextlib
+import gzip
+import hashlib
+import heapq
+import http.client
 import http.server
+import json
 import os
-import urllib.error
-import urllib.request
+import re
+import secrets
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are served
+    brotli = None
 
 HOST = "0.0.0.0"
 PORT = int(os.environ.get("PORT", "8099"))
 WWW_ROOT = os.environ.get("WWW_ROOT", "/app/www")
 COURSES_JSON_PATH = os.environ.get("COURSES_JSON", "/share/course-watch/courses.json")
 MEDIA_URL = os.environ.get("MEDIA_URL", "").rstrip("/")
+# Worker threads serving requests; MAX_STREAMS of them may hold an upstream
+# transfer at once so the UI, courses.json and seeks are never starved.
+WORKERS = max(1, int(os.environ.get("WORKERS", "16")))
+MAX_STREAMS = max(1, int(os.environ.get("MAX_STREAMS", "8")))
+# Seconds a request waits for a free stream before it is answered with 503;
+# a waiting request occupies a worker.
+STREAM_WAIT = float(os.environ.get("STREAM_WAIT", "2"))
+# Seconds a client socket may stall (sending its request or reading the
+# response) before the connection is dropped and its worker freed.
+CLIENT_TIMEOUT = float(os.environ.get("CLIENT_TIMEOUT", "60"))
+# Idle keep-alive connections kept per upstream host, and how long they live.
+POOL_SIZE = max(0, int(os.environ.get("POOL_SIZE", "4")))
+POOL_IDLE = float(os.environ.get("POOL_IDLE", "30"))
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", "30"))
+# On-disk cache of proxied byte ranges; a size of 0 disables it.
+CACHE_DIR = os.environ.get("CACHE_DIR", "/data/cache")
+CACHE_SIZE = max(0, int(os.environ.get("CACHE_SIZE_MB", "2048"))) * 1024 * 1024
+CACHE_CHUNK = max(64, int(os.environ.get("CACHE_CHUNK_KB", "2048"))) * 1024
+SUBS_CACHE = max(0, int(os.environ.get("SUBS_CACHE_MB", "64"))) * 1024 * 1024
+# Background cache filling: bytes kept fetched ahead of the playing position,
+# and how much of the next video in the section is warmed when playback starts.
+READAHEAD = max(0, int(os.environ.get("READAHEAD_MB", "16"))) * 1024 * 1024
+PREFETCH_NEXT = max(0, int(os.environ.get("PREFETCH_NEXT_MB", "4"))) * 1024 * 1024
+PREFETCH_WORKERS = max(1, int(os.environ.get("PREFETCH_WORKERS", "2")))
+# How long size, type and validators of an upstream file are trusted.
+META_TTL = float(os.environ.get("META_TTL", "300"))
 
 _user = os.environ.get("WEBDAV_USER", "")
 _pass = os.environ.get("WEBDAV_PASS", "")
@@ -19,11 +63,939 @@ _auth = (
 )
 
 _PROXY_PREFIX = "/proxy/"
+_SUBS_PREFIX = "/subs/"
+# Converted subtitles are cached by upstream ETag; browsers may keep them a week
+_SUBS_MAX_AGE = 7 * 24 * 3600
+_API_COURSES = "/api/courses"
+_API_SEARCH = "/api/search"
+_PAGE_LIMIT = 50
+_MAX_PAGE_LIMIT = 500
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Score of a token found in a video title, its section name, its course name
+_FIELD_WEIGHTS = (4, 2, 1)
 _FORWARD_REQ_HEADERS = ("Range",)
 _FORWARD_RESP_HEADERS = ("Content-Type", "Content-Length", "Content-Range", "Accept-Ranges")
 
+_REDIRECTS = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 5
+# Errors raised when a pooled connection was closed by the upstream while idle
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionError, BrokenPipeError)
+
+_COPY_BUFSIZE = 256 * 1024
+# Chunks fetched from the upstream per request: a stream slot is held for one
+# such run at a time, never for a whole playback
+_FETCH_RUN = 4
+_ENCODINGS = ("br", "gzip")  # server preference order
+_SRT_TIME_RE = re.compile(rb"(\d+:\d{2}:\d{2}),(\d{3})")
+_RANGE_RE = re.compile(r"(\d*)-(\d*)$")
+_MAX_RANGES = 32
+# Characters a browser leaves unescaped in a URL path
+_PATH_SAFE = "/:@!$&'()*+,;=~"
+
+# Files whose read-ahead window is remembered, for dropping superseded read-ahead
+_MAX_WINDOWS = 256
+
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def _target(raw: str) -> str:
+    """Resolve a /proxy/ path to the upstream URL.
+
+    Absolute URL passes through; relative path gets MEDIA_URL prepended.
+    """
+    if raw.startswith("http://") or raw.startswith("https://"):
+        return raw
+    return f"{MEDIA_URL}/{raw.lstrip('/')}" if MEDIA_URL else raw
+
+
+def _parse_ranges(value: str, size: int) -> list[tuple[int, int]] | None:
+    """Parse a Range header into inclusive (start, end) offsets.
+
+    Handles suffix ranges (bytes=-500) and multiple ranges. Returns None when
+    the header is malformed (it must then be ignored) and an empty list when
+    no range is satisfiable.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    parts = spec.split(",")
+    if len(parts) > _MAX_RANGES:
+        return None
+    ranges = []
+    for part in parts:
+        m = _RANGE_RE.match(part.strip())
+        if not m or not any(m.groups()):
+            return None
+        first, last = m.groups()
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            if int(last) == 0:
+                continue
+            start = max(0, size - int(last))
+            end = size - 1
+        if start < size:
+            ranges.append((start, end))
+    return ranges
+
+
+def _srt_to_vtt(lines):
+    """Convert SRT lines (bytes) to WebVTT, one line at a time.
+
+    Input that already is WebVTT passes through unchanged.
+    """
+    lines = iter(lines)
+    first = True
+    for line in lines:
+        line = line.rstrip(b"\r\n")
+        if first:
+            line = line.removeprefix(b"\xef\xbb\xbf")
+            if line.startswith(b"WEBVTT"):
+                yield line + b"\n"
+                yield from (rest.rstrip(b"\r\n") + b"\n" for rest in lines)
+                return
+            yield b"WEBVTT\n\n"
+            first = False
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            text = line.decode("cp1252", errors="replace")
+        yield _SRT_TIME_RE.sub(rb"\1.\2", text.encode("utf-8")) + b"\n"
+
+
+def _readlines(head: bytes, resp):
+    """Yield the lines of an already-read prefix followed by the rest of resp."""
+    *complete, partial = head.split(b"\n")
+    for line in complete:
+        yield line + b"\n"
+    if line := partial + resp.readline():
+        yield line
+    yield from iter(resp.readline, b"")
+
+
+def _etag_match(header: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    strip = lambda t: t.strip().removeprefix("W/")  # noqa: E731
+    return strip(etag) in {strip(t) for t in header.split(",")}
+
+
+def _pick_encoding(accept: str, available) -> str:
+    """Choose a content coding from an Accept-Encoding header; "" is identity."""
+    weights = {}
+    for item in accept.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if (params := params.strip()).startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = "", 0.0
+    for enc in _ENCODINGS:
+        q = weights.get(enc, weights.get("*", 0.0))
+        if enc in available and q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class UpstreamResponse:
+    """Upstream response that hands its connection back to the pool on close.
+
+    The connection is only reused when the body was read to the end and the
+    upstream did not ask to close it; otherwise it is dropped.
+    """
+
+    def __init__(self, pool: "UpstreamPool", key: tuple, conn, resp) -> None:
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._resp.read(amt)
+
+    def readline(self, limit: int = -1) -> bytes:
+        return self._resp.readline(limit)
+
+    def readinto(self, buf) -> int:
+        return self._resp.readinto(buf)
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        if self._resp.length == 0:
+            self._resp.read()  # HEAD / empty bodies: mark the response complete
+        if self._resp.isclosed() and not self._resp.will_close:
+            self._pool._release(self._key, self._conn)
+        else:
+            self._resp.close()
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self) -> "UpstreamResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class UpstreamPool:
+    """Keep-alive HTTP(S) connections to upstream hosts, reused across requests."""
+
+    def __init__(self, size: int = POOL_SIZE, idle_timeout: float = POOL_IDLE,
+                 timeout: float = UPSTREAM_TIMEOUT) -> None:
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle: dict[tuple, list[tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def request(self, method: str, url: str, headers: dict[str, str]) -> UpstreamResponse:
+        """Send a request, following redirects, and return the open response."""
+        for _ in range(_MAX_REDIRECTS + 1):
+            resp = self._request_once(method, url, headers)
+            if resp.status not in _REDIRECTS or not (loc := resp.headers.get("Location")):
+                return resp
+            resp.read()
+            resp.close()
+            url = urllib.parse.urljoin(url, loc)
+            if resp.status == 303 and method != "HEAD":
+                method = "GET"
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "idle": sum(len(v) for v in self._idle.values()),
+            }
+
+    def _request_once(self, method: str, url: str, headers: dict[str, str]) -> UpstreamResponse:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported upstream URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        conn, reused = self._acquire(key)
+        try:
+            conn.request(method, path, headers=headers)
+            resp = conn.getresponse()
+        except _STALE_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            # The upstream closed the idle connection; retry once on a fresh one
+            with self._lock:
+                self.stale += 1
+            conn = self._connect(key)
+            try:
+                conn.request(method, path, headers=headers)
+                resp = conn.getresponse()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        return UpstreamResponse(self, key, conn, resp)
+
+    def _acquire(self, key: tuple) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, since = idle.pop()
+                if now - since <= self.idle_timeout:
+                    self.hits += 1
+                    return conn, True
+                conn.close()
+            self.misses += 1
+        return self._connect(key), False
+
+    def _connect(self, key: tuple) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def _release(self, key: tuple, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+
+_upstream = UpstreamPool()
+
+
+@dataclass(frozen=True)
+class Meta:
+    size: int
+    content_type: str
+    etag: str
+    last_modified: str
+
+    @property
+    def validator(self) -> str:
+        return self.etag or self.last_modified
+
+
+def _probe(target: str, headers: dict[str, str]) -> Meta | None:
+    """HEAD an upstream file; None unless it has a size, validator and byte ranges.
+
+    Raises when the upstream gives no definite answer (no response, a 5xx or
+    429), so a passing failure isn't mistaken for a file that can't be served.
+    """
+    with _upstream.request("HEAD", target, headers) as resp:
+        if resp.status >= 500 or resp.status == 429:
+            raise http.client.HTTPException(f"upstream answered {resp.status}")
+        if resp.status != 200:
+            return None
+        meta = Meta(
+            size=int(resp.headers.get("Content-Length") or -1),
+            content_type=resp.headers.get("Content-Type") or "application/octet-stream",
+            etag=resp.headers.get("ETag", ""),
+            last_modified=resp.headers.get("Last-Modified", ""),
+        )
+        ranges = resp.headers.get("Accept-Ranges", "")
+    if meta.size <= 0 or not meta.validator or "bytes" not in ranges:
+        return None
+    return meta
+
+
+class MetaCache:
+    """Upstream file metadata, trusted for `ttl` seconds.
+
+    Lets HEAD, conditional and range requests be answered without asking the
+    upstream first. Files that can't be served locally are remembered as None
+    for as long, so they are proxied without a HEAD in front of every request.
+    A probe that fails outright is remembered as None for only `retry` seconds.
+    """
+
+    def __init__(self, ttl: float = META_TTL, retry: float = 5.0,
+                 max_entries: int = 4096) -> None:
+        self.ttl = ttl
+        self.retry = min(retry, ttl)
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Meta | None, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, target: str, headers: dict[str, str]) -> Meta | None:
+        name = urllib.parse.unquote(target)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        ttl = self.ttl
+        try:
+            meta = _probe(target, headers)
+        except Exception:
+            meta, ttl = None, self.retry
+        if ttl > 0:
+            with self._lock:
+                self._entries[name] = (meta, now + ttl)
+                self._entries.move_to_end(name)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return meta
+
+    def invalidate(self, target: str) -> None:
+        with self._lock:
+            self._entries.pop(urllib.parse.unquote(target), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_meta = MetaCache()
+
+
+class SegmentCache:
+    """Fixed-size chunks of upstream files kept on disk, evicted least-recently-used.
+
+    Chunks live under <directory>/<key>/<index>, where the key hashes the
+    upstream URL with its ETag or Last-Modified, so a changed file never
+    serves stale bytes.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, budget: int = CACHE_SIZE,
+                 chunk_size: int = CACHE_CHUNK) -> None:
+        self.directory = directory
+        self.budget = budget
+        self.chunk_size = chunk_size
+        self._chunks: OrderedDict[str, int] = OrderedDict()  # "key/index" -> size
+        self._used = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    @staticmethod
+    def key(url: str, validator: str) -> str:
+        # Unquote so the browser's and our own escaping of a path hit the same entry
+        url = urllib.parse.unquote(url)
+        return hashlib.sha1(f"{url}\0{validator}".encode()).hexdigest()
+
+    def has(self, key: str, index: int) -> bool:
+        with self._lock:
+            return f"{key}/{index}" in self._chunks
+
+    def open(self, key: str, index: int):
+        """Open a cached chunk for reading, or return None if it isn't cached.
+
+        The open file stays readable even if the chunk is evicted meanwhile.
+        """
+        name = f"{key}/{index}"
+        with self._lock:
+            if name not in self._chunks:
+                self.misses += 1
+                return None
+            self._chunks.move_to_end(name)
+            self.hits += 1
+        try:
+            return open(os.path.join(self.directory, name), "rb")
+        except OSError:
+            self._forget(name)
+            return None
+
+    def put(self, key: str, index: int, data: bytes) -> None:
+        name = f"{key}/{index}"
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"course-watch: cache write failed: {e}", flush=True)
+            return
+        with self._lock:
+            self._used += len(data) - self._chunks.pop(name, 0)
+            self._chunks[name] = len(data)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "chunks": len(self._chunks),
+                "bytes": self._used,
+                "budget": self.budget,
+            }
+
+    def _forget(self, name: str) -> None:
+        with self._lock:
+            self._used -= self._chunks.pop(name, 0)
+
+    def _evict(self) -> None:
+        # Caller holds the lock
+        while self._used > self.budget and self._chunks:
+            name, size = self._chunks.popitem(last=False)
+            self._used -= size
+            path = os.path.join(self.directory, name)
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))  # only succeeds once the file's dir is empty
+            except OSError:
+                pass
+
+    def _scan(self) -> None:
+        """Index chunks left by a previous run, oldest first."""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for fn in files:
+                path = os.path.join(root, fn)
+                if fn.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+                st = os.stat(path)
+                found.append((st.st_mtime, os.path.relpath(path, self.directory), st.st_size))
+        with self._lock:
+            for _, name, size in sorted(found):
+                self._chunks[name] = size
+                self._used += size
+            self._evict()
+
+
+_cache = SegmentCache(os.path.join(CACHE_DIR, "chunks"))
+# Converted subtitles: one "chunk" per file
+_subs = SegmentCache(os.path.join(CACHE_DIR, "subs"), budget=SUBS_CACHE)
+
+
+def _fetch_chunks(target: str, headers: dict[str, str], key: str,
+                  first: int, last: int, size: int):
+    """Fetch chunks first..last with one upstream range request, caching each.
+
+    Yields (index, data) as every chunk completes.
+    """
+    cs = _cache.chunk_size
+    lo, hi = first * cs, min((last + 1) * cs, size) - 1
+    with _upstream.request("GET", target, {**headers, "Range": f"bytes={lo}-{hi}"}) as resp:
+        if resp.status != 206:
+            _meta.invalidate(target)  # changed upstream (If-Range failed) or ranges unsupported
+            raise http.client.HTTPException(f"upstream answered {resp.status} to a range request")
+        for i in range(first, last + 1):
+            want = min(cs, size - i * cs)
+            data = resp.read(want)
+            if len(data) != want:
+                raise http.client.IncompleteRead(data, want - len(data))
+            _cache.put(key, i, data)
+            yield i, data
+
+
+def _runs(indices: list[int]) -> list[tuple[int, int]]:
+    """(first, last) of each run of consecutive numbers in ascending indices."""
+    runs: list[tuple[int, int]] = []
+    for i in indices:
+        if runs and runs[-1][1] == i - 1:
+            runs[-1] = (runs[-1][0], i)
+        else:
+            runs.append((i, i))
+    return runs
+
+
+class Prefetcher:
+    """Fills the segment cache in the background.
+
+    Keeps a read-ahead window of chunks fetched beyond the position being
+    played, and warms the start of the next video in the section. Chunks a
+    worker is fetching are tracked so a viewer reaching one waits for it
+    instead of fetching it a second time; a viewer never waits for chunks
+    still queued, it fetches them itself and the worker skips them. Queued
+    read-ahead that falls outside the latest window of its file (the viewer
+    moved on or seeked) is dropped when its turn comes.
+    """
+
+    def __init__(self, workers: int = PREFETCH_WORKERS, window: int = READAHEAD,
+                 next_bytes: int = PREFETCH_NEXT) -> None:
+        self.window = window
+        self.next_bytes = next_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._queued: set[str] = set()                   # waiting for a worker
+        self._inflight: dict[str, threading.Event] = {}  # being fetched by a worker
+        # key -> (first, last) chunk of the read-ahead window last asked for
+        self._windows: OrderedDict[str, tuple[int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.failed = 0
+        self.warmed = 0
+        self.dropped = 0
+
+    def pending(self, key: str, index: int) -> bool:
+        """True while a worker is fetching the chunk."""
+        with self._lock:
+            return f"{key}/{index}" in self._inflight
+
+    def wait(self, key: str, index: int, timeout: float = UPSTREAM_TIMEOUT) -> bool:
+        """Block until an in-flight chunk is done; False if it was not in flight."""
+        with self._lock:
+            event = self._inflight.get(f"{key}/{index}")
+        return event is not None and event.wait(timeout)
+
+    def read_ahead(self, target: str, headers: dict[str, str], key: str,
+                   index: int, size: int) -> None:
+        """Schedule the window of chunks following chunk `index`."""
+        if self.window:
+            last = (index * _cache.chunk_size + self.window) // _cache.chunk_size
+            with self._lock:
+                self._windows[key] = (index + 1, last)
+                self._windows.move_to_end(key)
+                while len(self._windows) > _MAX_WINDOWS:
+                    self._windows.popitem(last=False)
+            self._schedule(target, headers, key, index + 1, last, size, ahead=True)
+
+    def warm(self, target: str, headers: dict[str, str]) -> None:
+        """Fetch the first `next_bytes` of another file in the background."""
+        if self.next_bytes:
+            self._pool.submit(self._warm, target, headers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "fetched": self.fetched,
+                "failed": self.failed,
+                "warmed": self.warmed,
+                "dropped": self.dropped,
+                "queued": len(self._queued),
+                "inflight": len(self._inflight),
+            }
+
+    def _warm(self, target: str, headers: dict[str, str]) -> None:
+        meta = _meta.get(target, headers)
+        if meta is None:
+            return
+        key = SegmentCache.key(target, meta.validator)
+        last = (min(self.next_bytes, meta.size) - 1) // _cache.chunk_size
+        if self._schedule(target, headers, key, 0, last, meta.size):
+            with self._lock:
+                self.warmed += 1
+
+    def _schedule(self, target: str, headers: dict[str, str], key: str,
+                  first: int, last: int, size: int, ahead: bool = False) -> bool:
+        last = min(last, (size - 1) // _cache.chunk_size)
+        queued = []
+        with self._lock:
+            for i in range(first, last + 1):
+                name = f"{key}/{i}"
+                if name in self._queued or name in self._inflight or _cache.has(key, i):
+                    continue
+                self._queued.add(name)
+                queued.append(i)
+        for lo, hi in _runs(queued):
+            self._pool.submit(self._start, target, headers, key, lo, hi, size, ahead)
+        return bool(queued)
+
+    def _start(self, target: str, headers: dict[str, str], key: str,
+               first: int, last: int, size: int, ahead: bool) -> None:
+        """A worker picked up chunks first..last: fetch those still wanted."""
+        wanted = []
+        with self._lock:
+            window = self._windows.get(key)
+            for i in range(first, last + 1):
+                name = f"{key}/{i}"
+                self._queued.discard(name)
+                if name in self._inflight or _cache.has(key, i):
+                    continue
+                if ahead and not (window and window[0] <= i <= window[1]):
+                    self.dropped += 1
+                    continue
+                self._inflight[name] = threading.Event()
+                wanted.append(i)
+        for lo, hi in _runs(wanted):
+            self._fetch(target, headers, key, lo, hi, size)
+
+    def _fetch(self, target: str, headers: dict[str, str], key: str,
+               first: int, last: int, size: int) -> None:
+        done = first
+        try:
+            for i, _ in _fetch_chunks(target, headers, key, first, last, size):
+                self._finish(key, i, ok=True)
+                done = i + 1
+        except Exception as e:
+            print(f"course-watch: prefetch failed for {target}: {e}", flush=True)
+        finally:
+            for i in range(done, last + 1):
+                self._finish(key, i, ok=False)
+
+    def _finish(self, key: str, index: int, ok: bool) -> None:
+        with self._lock:
+            event = self._inflight.pop(f"{key}/{index}", None)
+            if ok:
+                self.fetched += 1
+            else:
+                self.failed += 1
+        if event:
+            event.set()
+
+
+_prefetch = Prefetcher()
+
+
+@dataclass(frozen=True)
+class Variants:
+    bodies: dict[str, bytes]  # content coding ("" = identity) -> body
+    etags: dict[str, str]
+
+
+class CompressedFile:
+    """A local file held in memory with precomputed gzip and brotli variants.
+
+    The variants and their strong ETags are rebuilt once whenever the file's
+    mtime or size changes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._stamp: tuple[float, int] | None = None
+        self._variants: Variants | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Variants:
+        """Return the current variants; raises OSError if the file is missing."""
+        st = os.stat(self.path)
+        stamp = (st.st_mtime, st.st_size)
+        with self._lock:
+            if stamp != self._stamp or self._variants is None:
+                with open(self.path, "rb") as f:
+                    data = f.read()
+                self._variants = self._compress(data)
+                self._stamp = stamp
+            return self._variants
+
+    @staticmethod
+    def _compress(data: bytes) -> Variants:
+        bodies = {"": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            # Built inside a request: quality 11 is several times slower for
+            # a few percent smaller output.
+            bodies["br"] = brotli.compress(data, quality=9)
+        digest = hashlib.sha1(data).hexdigest()[:20]
+        etags = {enc: f'"{digest}{"-" + enc if enc else ""}"' for enc in bodies}
+        return Variants(bodies=bodies, etags=etags)
+
+
+_courses_file = CompressedFile(COURSES_JSON_PATH)
+_index_file = CompressedFile(os.path.join(WWW_ROOT, "index.html"))
+
+
+@dataclass
+class Library:
+    version: str                     # changes whenever courses.json does
+    courses: list[dict]
+    summaries: list[dict]            # courses without their sections
+    next_video: dict[str, str]       # video path -> next video in its section
+    details: dict[int, bytes]        # course id -> encoded /api/courses/<id> body
+
+
+class Catalogue:
+    """Parsed courses.json, reloaded whenever the file's mtime changes.
+
+    Video paths are kept unquoted, exactly as they appear in the file.
+    """
+
+    def __init__(self, path: str = COURSES_JSON_PATH) -> None:
+        self.path = path
+        self._stamp: tuple[float, int] | None = None
+        self._library: Library | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Library:
+        """Return the current library; raises OSError or ValueError if unreadable."""
+        st = os.stat(self.path)
+        stamp = (st.st_mtime, st.st_size)
+        with self._lock:
+            if stamp != self._stamp or self._library is None:
+                with open(self.path, "rb") as f:
+                    data = json.load(f)
+                self._library = self._build(data, f"{st.st_mtime_ns:x}-{st.st_size:x}")
+                self._stamp = stamp
+            return self._library
+
+    def next_after(self, video: str) -> str | None:
+        try:
+            return self.get().next_video.get(video.lstrip("/"))
+        except (OSError, ValueError):
+            return None
+
+    def course(self, library: Library, cid: int) -> bytes:
+        """Encoded detail document for one course, built on first request."""
+        with self._lock:
+            if (body := library.details.get(cid)) is None:
+                course = library.courses[cid]
+                body = json.dumps({
+                    "id": cid,
+                    "name": course.get("name", ""),
+                    "sections": course.get("sections", []),
+                }, ensure_ascii=False).encode()
+                library.details[cid] = body
+            return body
+
+    @staticmethod
+    def _build(data: dict, version: str) -> Library:
+        courses = data.get("courses", [])
+        summaries = []
+        next_video = {}
+        for cid, course in enumerate(courses):
+            sections = course.get("sections", [])
+            summaries.append({
+                "id": cid,
+                "name": course.get("name", ""),
+                "sections": len(sections),
+                "videos": sum(len(s.get("videos", [])) for s in sections),
+            })
+            for section in sections:
+                videos = [v.get("video", "").lstrip("/") for v in section.get("videos", [])]
+                for cur, nxt in zip(videos, videos[1:]):
+                    if cur and nxt:
+                        next_video[cur] = nxt
+        return Library(version=version, courses=courses, summaries=summaries,
+                       next_video=next_video, details={})
+
+
+_catalogue = Catalogue()
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass
+class CourseTerms:
+    """Search terms of one course: token -> [(video offset in course, weight)]."""
+    postings: dict[str, list[tuple[int, int]]]
+    videos: list[tuple[int, int, str, str]]  # (section, video, title, path) per offset
+
+
+class SearchIndex:
+    """Inverted index over every video title, section and course name.
+
+    Rebuilt when courses.json changes; courses whose content is unchanged
+    reuse their tokenised terms, so only edited courses are re-tokenised.
+    Video ids are positions in the flattened course → section → video order
+    the player uses.
+    """
+
+    def __init__(self, catalogue: Catalogue = _catalogue) -> None:
+        self.catalogue = catalogue
+        self.version = ""
+        self._terms: dict[str, CourseTerms] = {}  # course content hash -> terms
+        self._postings: dict[str, dict[int, int]] = {}  # token -> {video id: weight}
+        self._vocab: list[str] = []
+        self._sizes: list[int] = [0]  # cumulative posting counts along _vocab
+        # (course, section, video, title, path) per video id
+        self._videos: list[tuple[int, int, int, str, str]] = []
+        self._lock = threading.Lock()
+
+    def search(self, query: str, offset: int = 0, limit: int = _PAGE_LIMIT
+               ) -> tuple[str, int, list[tuple[int, int, int, int, int, str, str]]]:
+        """Return (version, total hits, page) with the page's hits best first.
+
+        Each hit is (video id, score, course, section, video, title, path),
+        resolved against the same index the hits came from. Every query token must
+        match the start of a token in the video's title, section or course name.
+        """
+        library = self.catalogue.get()
+        with self._lock:
+            if library.version != self.version:
+                self._rebuild(library)
+            spans = []
+            for q in dict.fromkeys(_tokens(query)):
+                lo = bisect.bisect_left(self._vocab, q)
+                hi = bisect.bisect_left(self._vocab, q + "\U0010ffff")
+                spans.append((self._sizes[hi] - self._sizes[lo], q, self._vocab[lo:hi]))
+            # Most selective token first; the rest only score its candidates
+            spans.sort()
+            scores: dict[int, int] | None = None
+            for cost, q, tokens in spans:
+                if scores is not None and len(scores) * len(tokens) < cost:
+                    for vid in list(scores):
+                        best = max((self._postings[t].get(vid, 0) * (2 if t == q else 1)
+                                    for t in tokens), default=0)
+                        if best:
+                            scores[vid] += best
+                        else:
+                            del scores[vid]
+                else:
+                    matched: dict[int, int] = {}
+                    for token in tokens:
+                        exact = 2 if token == q else 1
+                        for vid, weight in self._postings[token].items():
+                            if weight * exact > matched.get(vid, 0):
+                                matched[vid] = weight * exact
+                    if scores is None:
+                        scores = matched
+                    else:
+                        scores = {v: sc + matched[v] for v, sc in scores.items() if v in matched}
+                if not scores:
+                    break
+            scores = scores or {}
+            top = heapq.nsmallest(offset + limit, scores.items(),
+                                  key=lambda item: (-item[1], item[0]))
+            hits = [(vid, score, *self._videos[vid]) for vid, score in top[offset:]]
+            return self.version, len(scores), hits
+
+    def _rebuild(self, library: Library) -> None:
+        terms: dict[str, CourseTerms] = {}
+        postings: dict[str, dict[int, int]] = {}
+        videos: list[tuple[int, int, int, str, str]] = []
+        for cid, course in enumerate(library.courses):
+            digest = hashlib.sha1(json.dumps(course, sort_keys=True).encode()).hexdigest()
+            ct = terms.get(digest) or self._terms.get(digest) or self._tokenise(course)
+            terms[digest] = ct
+            base = len(videos)
+            videos.extend((cid, *video) for video in ct.videos)
+            for token, hits in ct.postings.items():
+                postings.setdefault(token, {}).update((base + off, w) for off, w in hits)
+        self._terms = terms
+        self._postings = postings
+        self._vocab = sorted(postings)
+        self._sizes = [0]
+        for token in self._vocab:
+            self._sizes.append(self._sizes[-1] + len(postings[token]))
+        self._videos = videos
+        self.version = library.version
+
+    @staticmethod
+    def _tokenise(course: dict) -> CourseTerms:
+        postings: dict[str, list[tuple[int, int]]] = {}
+        videos = []
+        course_tokens = _tokens(course.get("name", ""))
+        for si, section in enumerate(course.get("sections", [])):
+            section_tokens = _tokens(section.get("name", ""))
+            for vi, video in enumerate(section.get("videos", [])):
+                title = video.get("title", "")
+                offset = len(videos)
+                videos.append((si, vi, title, video.get("video", "")))
+                best: dict[str, int] = {}
+                fields = (_tokens(title), section_tokens, course_tokens)
+                for weight, tokens in zip(_FIELD_WEIGHTS, fields):
+                    for token in tokens:
+                        if weight > best.get(token, 0):
+                            best[token] = weight
+                for token, weight in best.items():
+                    postings.setdefault(token, []).append((offset, weight))
+        return CourseTerms(postings=postings, videos=videos)
+
+
+_search = SearchIndex()
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """HTTP server dispatching each connection to a bounded worker pool."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, workers: int = WORKERS) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="worker")
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address) -> None:
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    timeout = CLIENT_TIMEOUT
+    _claimed = False  # holds a stream slot not yet used by _stream_slot()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=WWW_ROOT, **kwargs)
 
@@ -35,47 +1007,280 @@ class Handler(http.server.SimpleHTTPRequestHandler):
     def do_HEAD(self):
         if self.path.startswith(_PROXY_PREFIX):
             self._proxy(head=True)
+        elif self._route() == "/courses.json":
+            self._serve_courses(head=True)
+        elif self._route() in ("/", "/index.html"):
+            self._serve_compressed(_index_file, "text/html; charset=utf-8", head=True)
         else:
             super().do_HEAD()
 
     def do_GET(self):
-        if self.path == "/courses.json" or self.path.startswith("/courses.json?"):
+        if self._route() == "/courses.json":
             self._serve_courses()
+        elif self._route() in ("/", "/index.html"):
+            self._serve_compressed(_index_file, "text/html; charset=utf-8")
+        elif self._route() == "/stats":
+            self._serve_stats()
+        elif self._route() == _API_COURSES or self._route().startswith(_API_COURSES + "/"):
+            self._serve_catalogue()
+        elif self._route() == _API_SEARCH:
+            self._serve_search()
         elif self.path.startswith(_PROXY_PREFIX):
             self._proxy()
+        elif self.path.startswith(_SUBS_PREFIX):
+            self._serve_subtitles()
         else:
             super().do_GET()
 
-    def _serve_courses(self):
+    def _route(self) -> str:
+        return self.path.split("?", 1)[0]
+
+    def _serve_courses(self, head: bool = False):
+        self._serve_compressed(_courses_file, "application/json; charset=utf-8", head)
+
+    def _serve_compressed(self, asset: CompressedFile, ctype: str, head: bool = False):
+        """Serve an in-memory file, honouring If-None-Match and Accept-Encoding."""
         try:
-            with open(COURSES_JSON_PATH, "rb") as f:
-                data = f.read()
+            variants = asset.get()
+        except FileNotFoundError:
+            self.send_error(404, f"{os.path.basename(asset.path)} not found at {asset.path}")
+            return
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+        enc = _pick_encoding(self.headers.get("Accept-Encoding", ""), variants.bodies)
+        etag = variants.etags[enc]
+        body = variants.bodies[enc]
+        inm = self.headers.get("If-None-Match")
+        fresh = bool(inm) and _etag_match(inm, etag)
+        if fresh:
+            self.send_response(304)
+        else:
             self.send_response(200)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(data)))
-            self._cors()
-            self.end_headers()
-            self.wfile.write(data)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            if enc:
+                self.send_header("Content-Encoding", enc)
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", "no-cache")
+        self._cors()
+        self.end_headers()
+        if not head and not fresh:
+            self.wfile.write(body)
+
+    def _serve_stats(self):
+        self._send_json({
+            "pool": _upstream.stats(),
+            "meta": _meta.stats(),
+            "cache": _cache.stats(),
+            "prefetch": _prefetch.stats(),
+            "subtitles": _subs.stats(),
+        }, cache="no-store")
+
+    def _serve_catalogue(self):
+        """GET /api/courses?cursor=&limit=  → page of course summaries
+        GET /api/courses/<id>             → one course with sections and videos
+        """
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        try:
+            library = _catalogue.get()
         except FileNotFoundError:
             self.send_error(404, f"courses.json not found at {COURSES_JSON_PATH}")
-        except Exception as e:
+            return
+        except (OSError, ValueError) as e:
+            self.send_error(500, str(e))
+            return
+
+        cid = parts.path[len(_API_COURSES):].strip("/")
+        if cid:
+            if not (cid.isascii() and cid.isdigit()) or int(cid) >= len(library.courses):
+                self.send_error(404, f"No course {cid}")
+                return
+            body = _catalogue.course(library, int(cid))
+            self._send_json(body, etag=f'"{library.version}-{cid}"')
+            return
+
+        try:
+            offset = max(0, int(query.get("cursor", ["0"])[0] or 0))
+            limit = int(query.get("limit", [str(_PAGE_LIMIT)])[0])
+        except ValueError:
+            self.send_error(400, "cursor and limit must be integers")
+            return
+        limit = min(max(1, limit), _MAX_PAGE_LIMIT)
+        more = offset + limit < len(library.summaries)
+        self._send_json({
+            "version": library.version,
+            "total": len(library.summaries),
+            "courses": library.summaries[offset:offset + limit],
+            "next": str(offset + limit) if more else None,
+        }, etag=f'"{library.version}-{offset}-{limit}"')
+
+    def _serve_search(self):
+        """GET /api/search?q=&cursor=&limit=  → ranked page of matching videos"""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        q = query.get("q", [""])[0]
+        try:
+            offset = max(0, int(query.get("cursor", ["0"])[0] or 0))
+            limit = int(query.get("limit", [str(_PAGE_LIMIT)])[0])
+        except ValueError:
+            self.send_error(400, "cursor and limit must be integers")
+            return
+        limit = min(max(1, limit), _MAX_PAGE_LIMIT)
+        try:
+            version, total, page = _search.search(q, offset, limit)
+        except FileNotFoundError:
+            self.send_error(404, f"courses.json not found at {COURSES_JSON_PATH}")
+            return
+        except (OSError, ValueError) as e:
             self.send_error(500, str(e))
+            return
+        hits = [{"id": vid, "course": cid, "section": si, "video": vi,
+                 "title": title, "path": path, "score": score}
+                for vid, score, cid, si, vi, title, path in page]
+        more = offset + limit < total
+        self._send_json({
+            "version": version,
+            "total": total,
+            "hits": hits,
+            "next": str(offset + limit) if more else None,
+        })
+
+    def _send_json(self, obj, etag: str = "", cache: str = "no-cache") -> None:
+        """Send a JSON document (or pre-encoded body), answering 304 on a matching ETag."""
+        inm = self.headers.get("If-None-Match")
+        if etag and inm and _etag_match(inm, etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self._cors()
+            self.end_headers()
+            return
+        data = obj if isinstance(obj, bytes) else json.dumps(obj, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", cache)
+        if etag:
+            self.send_header("ETag", etag)
+        self._cors()
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _acquire_stream(self) -> bool:
+        """Take one of the MAX_STREAMS upstream slots, or answer 503.
+
+        Only transfers from the upstream hold a slot; anything answered from
+        the caches or from cached metadata does not.
+        """
+        if _stream_slots.acquire(timeout=STREAM_WAIT):
+            return True
+        self.send_error(503, "Too many concurrent streams")
+        return False
+
+    @contextlib.contextmanager
+    def _stream_slot(self):
+        """Hold an upstream slot for one fetch.
 
-    def _proxy(self, head: bool = False):
+        Uses the slot claimed before the response headers if it is still
+        unused; otherwise waits for one, cutting the response short if none
+        frees up.
+        """
+        if self._claimed:
+            self._claimed = False
+        elif not _stream_slots.acquire(timeout=STREAM_WAIT):
+            raise http.client.HTTPException("too many concurrent streams")
+        try:
+            yield
+        finally:
+            _stream_slots.release()
+
+    def _serve_subtitles(self) -> None:
+        """GET /subs/<path>: an upstream SRT converted to WebVTT.
+
+        The result is cached by the upstream ETag/Last-Modified, so each file
+        is converted once rather than on every playback on every device.
+        """
+        target = _target(self.path[len(_SUBS_PREFIX):])
+        headers = {"Authorization": _auth} if _auth else {}
+        meta = _meta.get(target, headers)
+        key = SegmentCache.key(target, meta.validator) if meta else ""
+        etag = f'"{key[:20]}"' if key else ""
+
+        inm = self.headers.get("If-None-Match")
+        if etag and inm and _etag_match(inm, etag):
+            self.send_response(304)
+            self._subtitle_headers(etag)
+            self.end_headers()
+            return
+        if key and (f := _subs.open(key, 0)):
+            with f:
+                size = os.fstat(f.fileno()).st_size
+                self.send_response(200)
+                self.send_header("Content-Length", str(size))
+                self._subtitle_headers(etag)
+                self.end_headers()
+                self._sendfile(f, 0, size)
+            return
+
+        if not self._acquire_stream():
+            return
+        out: list[bytes] | None = None
+        try:
+            with _upstream.request("GET", target, headers) as resp:
+                if resp.status >= 400:
+                    self.send_error(resp.status, resp.reason)
+                    return
+                head = resp.read(512)
+                if b"\0" in head:
+                    self.send_error(415, "Binary subtitle formats are not supported")
+                    return
+                self.send_response(200)
+                self._subtitle_headers(etag)
+                self.end_headers()
+                out = []
+                for line in _srt_to_vtt(_readlines(head, resp)):
+                    self.wfile.write(line)
+                    out.append(line)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        except Exception as e:
+            if out is None:
+                self.send_error(502, str(e))
+            else:
+                self.log_error("subtitle stream failed: %s", e)
+                self.close_connection = True
+            return
+        finally:
+            _stream_slots.release()
+        if key:
+            _subs.put(key, 0, b"".join(out))
+
+    def _subtitle_headers(self, etag: str) -> None:
+        self.send_header("Content-Type", "text/vtt; charset=utf-8")
+        self.send_header("Cache-Control", f"public, max-age={_SUBS_MAX_AGE}")
+        if etag:
+            self.send_header("ETag", etag)
+        self._cors()
+
+    def _proxy(self, head: bool = False) -> None:
         raw = self.path[len(_PROXY_PREFIX):]
-        # Absolute URL passes through; relative path gets MEDIA_URL prepended
-        if raw.startswith("http://") or raw.startswith("https://"):
-            target = raw
-        else:
-            target = f"{MEDIA_URL}/{raw.lstrip('/')}" if MEDIA_URL else raw
-        req = urllib.request.Request(target, method="HEAD" if head else "GET")
-        if _auth:
-            req.add_header("Authorization", _auth)
+        target = _target(raw)
+        headers = {"Authorization": _auth} if _auth else {}
+        meta = _meta.get(target, headers)
+        if meta is not None:
+            self._serve_resource(target, headers, meta, head)
+            return
         for h in _FORWARD_REQ_HEADERS:
             if v := self.headers.get(h):
-                req.add_header(h, v)
+                headers[h] = v
+        if not self._acquire_stream():
+            return
         try:
-            with urllib.request.urlopen(req) as resp:
+            with _upstream.request("HEAD" if head else "GET", target, headers) as resp:
+                if resp.status >= 400:
+                    self.send_error(resp.status, resp.reason)
+                    return
                 self.send_response(resp.status)
                 for h in _FORWARD_RESP_HEADERS:
                     if v := resp.headers.get(h):
@@ -83,17 +1288,214 @@ class Handler(http.server.SimpleHTTPRequestHandler):
                 self._cors()
                 self.end_headers()
                 if not head:
-                    while chunk := resp.read(65536):
-                        self.wfile.write(chunk)
-        except urllib.error.HTTPError as e:
-            self.send_error(e.code, e.reason)
+                    buf = bytearray(_COPY_BUFSIZE)
+                    view = memoryview(buf)
+                    while n := resp.readinto(buf):
+                        self.wfile.write(view[:n])
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # viewer went away mid-stream; the upstream connection is dropped
         except Exception as e:
             self.send_error(502, str(e))
+        finally:
+            _stream_slots.release()
+
+    def _serve_resource(self, target: str, headers: dict[str, str], meta: Meta,
+                        head: bool) -> None:
+        """Answer a proxied request for a file whose metadata is known.
+
+        HEAD, If-None-Match, If-Range and Range (single, suffix and multiple)
+        are all resolved locally; only the bytes themselves come from the
+        segment cache or the upstream.
+        """
+        inm = self.headers.get("If-None-Match")
+        if inm and _etag_match(inm, meta.etag):
+            self.send_response(304)
+            self._validator_headers(meta)
+            self._cors()
+            self.end_headers()
+            return
+
+        ranges = None
+        rng = self.headers.get("Range")
+        if rng and self._if_range_holds(meta):
+            ranges = _parse_ranges(rng, meta.size)
+            if ranges == []:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{meta.size}")
+                self.send_header("Content-Length", "0")
+                self._cors()
+                self.end_headers()
+                return
+
+        if not ranges:
+            ranges = [(0, meta.size - 1)]
+            status = 200
+        else:
+            status = 206
+        if not head and _cache.enabled and ranges[0][0] < _cache.chunk_size:
+            self._warm_next()
+
+        boundary = secrets.token_hex(12) if len(ranges) > 1 else ""
+        parts = [
+            (f"\r\n--{boundary}\r\nContent-Type: {meta.content_type}\r\n"
+             f"Content-Range: bytes {start}-{end}/{meta.size}\r\n\r\n").encode()
+            if boundary else b""
+            for start, end in ranges
+        ]
+        tail = f"\r\n--{boundary}--\r\n".encode() if boundary else b""
+
+        # Claim an upstream slot before any header is sent, so a busy server
+        # can still answer 503; ranges held entirely in the cache need none.
+        # Each upstream fetch then holds a slot only while it runs.
+        if not head and self._needs_upstream(target, meta, ranges):
+            if not self._acquire_stream():
+                return
+            self._claimed = True
+        try:
+            self.send_response(status)
+            if boundary:
+                self.send_header("Content-Type", f"multipart/byteranges; boundary={boundary}")
+            else:
+                self.send_header("Content-Type", meta.content_type)
+            if status == 206 and not boundary:
+                start, end = ranges[0]
+                self.send_header("Content-Range", f"bytes {start}-{end}/{meta.size}")
+            length = sum(len(p) + end - start + 1 for p, (start, end) in zip(parts, ranges))
+            self.send_header("Content-Length", str(length + len(tail)))
+            self.send_header("Accept-Ranges", "bytes")
+            self._validator_headers(meta)
+            self._cors()
+            self.end_headers()
+            if head:
+                return
+
+            # Fail the upstream range request if the file changed since meta was cached
+            headers = {**headers, "If-Range": meta.validator}
+            for part, (start, end) in zip(parts, ranges):
+                self.wfile.write(part)
+                self._send_range(target, headers, meta, start, end)
+            self.wfile.write(tail)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            # Headers are already out; all we can do is cut the response short
+            self.log_error("stream failed: %s", e)
+            self.close_connection = True
+        finally:
+            if self._claimed:
+                self._claimed = False
+                _stream_slots.release()
+
+    @staticmethod
+    def _needs_upstream(target: str, meta: Meta, ranges: list[tuple[int, int]]) -> bool:
+        """True unless every chunk of ranges is already in the segment cache."""
+        if not _cache.enabled:
+            return True
+        key = SegmentCache.key(target, meta.validator)
+        cs = _cache.chunk_size
+        return any(not _cache.has(key, i)
+                   for start, end in ranges for i in range(start // cs, end // cs + 1))
+
+    def _if_range_holds(self, meta: Meta) -> bool:
+        """False when an If-Range header names a different version of the file."""
+        cond = self.headers.get("If-Range")
+        if not cond:
+            return True
+        if cond.startswith(('"', "W/")):
+            return not cond.startswith("W/") and cond == meta.etag
+        return cond == meta.last_modified
+
+    def _validator_headers(self, meta: Meta) -> None:
+        if meta.etag:
+            self.send_header("ETag", meta.etag)
+        if meta.last_modified:
+            self.send_header("Last-Modified", meta.last_modified)
+
+    def _send_range(self, target: str, headers: dict[str, str], meta: Meta,
+                    start: int, end: int) -> None:
+        if _cache.enabled:
+            key = SegmentCache.key(target, meta.validator)
+            self._send_chunks(target, headers, key, start, end, meta.size)
+            return
+        buf = bytearray(_COPY_BUFSIZE)
+        view = memoryview(buf)
+        piece = _FETCH_RUN * _cache.chunk_size
+        for lo in range(start, end + 1, piece):
+            hi = min(end, lo + piece - 1)
+            with (self._stream_slot(),
+                  _upstream.request("GET", target, {**headers, "Range": f"bytes={lo}-{hi}"}) as resp):
+                if resp.status != 206:
+                    _meta.invalidate(target)
+                    raise http.client.HTTPException(
+                        f"upstream answered {resp.status} to a range request")
+                remaining = hi - lo + 1
+                while remaining and (n := resp.readinto(view[:min(remaining, _COPY_BUFSIZE)])):
+                    self.wfile.write(view[:n])
+                    remaining -= n
+                if remaining:
+                    raise http.client.IncompleteRead(b"", remaining)
+
+    def _warm_next(self) -> None:
+        """Playback is starting: warm the next video of the section."""
+        raw = urllib.parse.unquote(self.path[len(_PROXY_PREFIX):])
+        if nxt := _catalogue.next_after(raw):
+            headers = {"Authorization": _auth} if _auth else {}
+            _prefetch.warm(_target(urllib.parse.quote(nxt, safe=_PATH_SAFE)), headers)
+
+    def _send_chunks(self, target: str, headers: dict[str, str], key: str,
+                     start: int, end: int, size: int) -> None:
+        cs = _cache.chunk_size
+        last = end // cs
+        index = start // cs
+        while index <= last:
+            _prefetch.read_ahead(target, headers, key, index, size)
+            f = _cache.open(key, index)
+            if f is None and _prefetch.wait(key, index):
+                f = _cache.open(key, index)
+            if f is not None:
+                with f:
+                    lo = max(start, index * cs) - index * cs
+                    hi = min(end + 1, (index + 1) * cs) - index * cs
+                    self._sendfile(f, lo, hi - lo)
+                index += 1
+                continue
+            # Fetch the run of chunks nobody has yet with a single upstream request
+            run_end = index
+            while (run_end < last and run_end - index + 1 < _FETCH_RUN
+                   and not _cache.has(key, run_end + 1)
+                   and not _prefetch.pending(key, run_end + 1)):
+                run_end += 1
+            with self._stream_slot():
+                for i, data in _fetch_chunks(target, headers, key, index, run_end, size):
+                    self._write_slice(data, i * cs, start, end)
+            index = run_end + 1
+
+    def _sendfile(self, f, offset: int, count: int) -> None:
+        """Send count bytes of a local file from offset straight to the socket.
+
+        Uses os.sendfile() through socket.sendfile(), so the bytes never pass
+        through Python; headers must already be flushed.
+        """
+        if count > 0:
+            self.connection.sendfile(f, offset, count)
+
+    def copyfile(self, source, outputfile) -> None:
+        # Static www/ files: same zero-copy path as courses.json and the cache
+        if outputfile is self.wfile:
+            self._sendfile(source, 0, os.fstat(source.fileno()).st_size)
+        else:
+            super().copyfile(source, outputfile)
+
+    def _write_slice(self, data: bytes, offset: int, start: int, end: int) -> None:
+        """Write the part of a chunk starting at offset that falls inside [start, end]."""
+        lo = max(start, offset) - offset
+        hi = min(end + 1, offset + len(data)) - offset
+        self.wfile.write(memoryview(data)[lo:hi])
 
     def _cors(self):
         self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Headers", "Range")
-        self.send_header("Access-Control-Expose-Headers", "Content-Range, Accept-Ranges")
+        self.send_header("Access-Control-Allow-Headers", "Range, If-None-Match, If-Range")
+        self.send_header("Access-Control-Expose-Headers", "Content-Range, Accept-Ranges, ETag")
 
     def log_message(self, format: str, *args: object) -> None:  # noqa: A002
         print(f"  {self.address_string()} — {format % args}", flush=True)
@@ -105,5 +1507,14 @@ if __name__ == "__main__":
     print(f"course-watch: serving {WWW_ROOT} on {HOST}:{PORT}", flush=True)
     print(f"course-watch: courses.json → {COURSES_JSON_PATH}", flush=True)
     print(f"course-watch: media base URL → {MEDIA_URL or '(none, absolute URLs only)'}", flush=True)
-    with http.server.HTTPServer((HOST, PORT), Handler) as srv:
+    print(f"course-watch: {WORKERS} workers, up to {MAX_STREAMS} concurrent streams", flush=True)
+    print(f"course-watch: keeping {POOL_SIZE} upstream connections per host for {POOL_IDLE:g}s", flush=True)
+    print(f"course-watch: file metadata cached for {META_TTL:g}s", flush=True)
+    if _cache.enabled:
+        print(f"course-watch: segment cache {CACHE_DIR} ({CACHE_SIZE // 2**20} MiB)", flush=True)
+        print(f"course-watch: read-ahead {READAHEAD // 2**20} MiB, "
+              f"next video warm-up {PREFETCH_NEXT // 2**20} MiB", flush=True)
+    else:
+        print("course-watch: segment cache disabled", flush=True)
+    with Server((HOST, PORT), Handler) as srv:
         srv.serve_forever()
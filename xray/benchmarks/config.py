@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Multi-server config generation benchmark for convert_links.py.
+
+Builds one configuration from --servers links made by parse.py and reports
+build and serialisation time and the size of the indented, compact and
+base64 output.
+
+Usage:
+    python benchmarks/config.py [--servers 1000] [--repeat 20]
+"""
+
+import argparse
+import base64
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import convert_links  # noqa: E402
+from parse import make_link  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--servers', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    servers, _ = convert_links.parse_batch(make_link(n) for n in range(args.servers))
+
+    def build() -> convert_links.ConfigBuilder:
+        builder = convert_links.ConfigBuilder()
+        for tag, link in servers:
+            builder.add_link(link, tag)
+        return builder
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        config = build().build()
+    per_build = (time.perf_counter() - start) / args.repeat
+    print(f"build     {len(servers):,} servers  {per_build * 1000:7.2f} ms")
+
+    for compact in (False, True):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            text = convert_links.to_json(config, compact)
+        per_dump = (time.perf_counter() - start) / args.repeat
+        encoded = base64.b64encode(text.encode('utf-8'))
+        print(f"{'compact' if compact else 'indented':<9} {per_dump * 1000:7.2f} ms  "
+              f"{len(text) / 1024:8.1f} KiB JSON  {len(encoded) / 1024:8.1f} KiB base64")
+
+
+if __name__ == '__main__':
+    main()
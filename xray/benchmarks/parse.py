@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Link parsing micro-benchmark for convert_links.py.
+
+Parses --links generated links (vless with REALITY, vmess, trojan and
+Shadowsocks in equal parts) and reports:
+
+  uncached  parse_link() without its cache, every link parsed from scratch
+  unique    through the cache, all links distinct
+  repeated  through the cache, --distinct links repeated as in subscriptions
+  records   bytes retained per parsed Link (tracemalloc)
+
+Usage:
+    python benchmarks/parse.py [--links 100000] [--distinct 500]
+"""
+
+import argparse
+import base64
+import gc
+import json
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import convert_links  # noqa: E402
+
+PBK = 'SbVKOEMjK0sIlbwg4akyBg5mL5KZwwB-ed4eEE7YnRc'
+
+
+def make_link(n: int) -> str:
+    """The n-th synthetic link; the scheme cycles through the four supported.
+
+    As in a provider's subscription, servers of one scheme differ in address,
+    credentials and name but share transport and TLS settings.
+    """
+    host = f"node{n}.example.com"
+    user = str(uuid.UUID(int=n))
+    kind = n % 4
+    if kind == 0:
+        return (f"vless://{user}@{host}:443?encryption=none&security=reality&sni=www.example.org"
+                f"&fp=chrome&pbk={PBK}&sid=6ba85179e30d4fc2&type=tcp&flow=xtls-rprx-vision#Node%20{n}")
+    if kind == 1:
+        data = {"v": "2", "ps": f"Node {n}", "add": host, "port": "443", "id": user, "aid": "0",
+                "scy": "auto", "net": "ws", "type": "none", "host": "cdn.example.com", "path": "/ws",
+                "tls": "tls"}
+        return "vmess://" + base64.b64encode(json.dumps(data).encode()).decode()
+    if kind == 2:
+        return f"trojan://secret{n}@{host}:443?security=tls&sni=cdn.example.com&type=grpc&path=svc#Node%20{n}"
+    auth = base64.urlsafe_b64encode(f"aes-256-gcm:secret{n}".encode()).decode().rstrip('=')
+    return f"ss://{auth}@{host}:8388#Node%20{n}"
+
+
+def timed(label: str, parse: Callable[[str], object], links: List[str]) -> None:
+    convert_links.parse_link.cache_clear()
+    start = time.perf_counter()
+    for link in links:
+        parse(link)
+    seconds = time.perf_counter() - start
+    info = convert_links.parse_link.cache_info()
+    print(f"{label:<9} {len(links):,} links  {seconds:6.3f} s  "
+          f"{len(links) / seconds:10,.0f} links/s  cache hits {info.hits:,}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--links', type=int, default=100_000)
+    parser.add_argument('--distinct', type=int, default=500,
+                        help='distinct links in the repeated run')
+    args = parser.parse_args()
+
+    unique = [make_link(n) for n in range(args.links)]
+    repeated = [unique[n % args.distinct] for n in range(args.links)]
+
+    timed('uncached', convert_links.parse_link.__wrapped__, unique)
+    timed('unique', convert_links.parse_link, unique)
+    timed('repeated', convert_links.parse_link, repeated)
+
+    gc.collect()
+    tracemalloc.start()
+    records = [convert_links.parse_link.__wrapped__(link) for link in unique]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"records   {len(records):,} Link records  {current / len(records):5.0f} B/record")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,217 +1,375 @@
 #!/usr/bin/env python3
 """
-Convert VLESS and Shadowsocks links to Xray configuration format.
+Convert VLESS, VMess, Trojan and Shadowsocks links to Xray configuration format.
 
 Usage:
     python convert_links.py "vless://..." [--output config.json] [--proxy-port 8080]
     python convert_links.py "ss://..." [--output config.json] [--proxy-port 8080]
+    python convert_links.py --input links.txt [--output config.json]
+    curl -s https://provider/sub | python convert_links.py --input - --base64
+    python convert_links.py --input links.txt --probe tls --keep 10
+    python convert_links.py --input links.txt --preset sniff --preset mux --preset tfo
 """
 
 import argparse
+import asyncio
 import base64
+import binascii
+import functools
 import json
+import re
+import socket
+import ssl
 import sys
+import time
 import urllib.parse
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
+# Batch outbounds are tagged PROXY_TAG_PREFIX + server name
+PROXY_TAG_PREFIX = 'proxy-'
+BALANCER_TAG = 'fastest'
+PROBE_URL = 'https://www.gstatic.com/generate_204'
+# Distinct links whose parsed form is kept
+PARSE_CACHE_SIZE = 4096
 
-def parse_vless_link(vless_url: str) -> Dict[str, Any]:
-    """Parse VLESS URL and return connection parameters."""
-    if not vless_url.startswith('vless://'):
-        raise ValueError("Invalid VLESS URL")
-    
-    # Remove vless:// prefix
-    url_part = vless_url[8:]
-    
-    # Split user info and server info
-    if '@' not in url_part:
-        raise ValueError("Invalid VLESS URL format")
-    
-    user_part, server_part = url_part.split('@', 1)
-    
-    # Parse user ID
-    user_id = user_part
-    
-    # Parse server part (may contain query parameters and fragment)
-    if '#' in server_part:
-        server_part, name = server_part.rsplit('#', 1)
-        name = urllib.parse.unquote(name)
-    else:
-        name = "VLESS Server"
-    
-    if '?' in server_part:
-        server_info, query_string = server_part.split('?', 1)
-        params = urllib.parse.parse_qs(query_string)
-    else:
-        server_info = server_part
-        params = {}
-    
-    # Parse server and port
-    if ':' in server_info:
-        server, port = server_info.rsplit(':', 1)
-        port = int(port)
-    else:
-        server = server_info
-        port = 443
-    
-    # Extract parameters
-    config = {
-        'server': server,
-        'port': port,
-        'user_id': user_id,
-        'name': name,
-        'encryption': params.get('encryption', ['none'])[0],
-        'flow': params.get('flow', [''])[0],
-        'security': params.get('security', ['tls'])[0],
-        'sni': params.get('sni', [''])[0],
-        'alpn': params.get('alpn', [''])[0],
-        'fp': params.get('fp', [''])[0],  # fingerprint
-        'type': params.get('type', ['tcp'])[0],  # network type
-        'path': params.get('path', [''])[0],
-        'host': params.get('host', [''])[0],
-        'headerType': params.get('headerType', [''])[0],
-        # REALITY specific parameters
-        'pbk': params.get('pbk', [''])[0],  # public key
-        'sid': params.get('sid', [''])[0],  # short ID
-        'password': params.get('password', [''])[0],  # REALITY password
-    }
-    
-    return config
 
+class Link(NamedTuple):
+    """A parsed proxy link. Fields a protocol does not use keep their defaults."""
+    scheme: str
+    server: str
+    port: int
+    name: str
+    user_id: str = ''           # vless, vmess
+    password: str = ''          # trojan, shadowsocks
+    method: str = ''            # shadowsocks cipher, vmess security
+    encryption: str = 'none'
+    flow: str = ''
+    security: str = ''          # '', 'tls' or 'reality'
+    sni: str = ''
+    alpn: str = ''
+    fp: str = ''                # TLS fingerprint
+    type: str = 'tcp'           # network
+    path: str = ''
+    host: str = ''
+    headerType: str = ''
+    pbk: str = ''               # REALITY public key
+    sid: str = ''               # REALITY short ID
+    reality_password: str = ''
 
-def parse_shadowsocks_link(ss_url: str) -> Dict[str, Any]:
-    """Parse Shadowsocks URL and return connection parameters."""
-    if not ss_url.startswith('ss://'):
-        raise ValueError("Invalid Shadowsocks URL")
-    
-    # Remove ss:// prefix
-    url_part = ss_url[5:]
-    
-    # Handle fragment (name)
-    if '#' in url_part:
-        url_part, name = url_part.rsplit('#', 1)
-        name = urllib.parse.unquote(name)
+
+# Query parameters of vless:// and trojan:// links → Link field
+QUERY_FIELDS = {
+    'encryption': 'encryption',
+    'flow': 'flow',
+    'security': 'security',
+    'sni': 'sni',
+    'alpn': 'alpn',
+    'fp': 'fp',
+    'type': 'type',
+    'path': 'path',
+    'host': 'host',
+    'headerType': 'headerType',
+    'pbk': 'pbk',
+    'sid': 'sid',
+    'password': 'reality_password',
+}
+
+# Keys of the JSON in vmess:// links → Link field
+VMESS_FIELDS = {
+    'add': 'server',
+    'port': 'port',
+    'id': 'user_id',
+    'ps': 'name',
+    'scy': 'method',
+    'net': 'type',
+    'type': 'headerType',
+    'host': 'host',
+    'path': 'path',
+    'tls': 'security',
+    'sni': 'sni',
+    'alpn': 'alpn',
+    'fp': 'fp',
+}
+
+SHADOWSOCKS_METHODS = frozenset({
+    'aes-128-gcm', 'aes-256-gcm',
+    'chacha20-poly1305', 'chacha20-ietf-poly1305',
+    'xchacha20-poly1305', 'xchacha20-ietf-poly1305',
+    '2022-blake3-aes-128-gcm', '2022-blake3-aes-256-gcm', '2022-blake3-chacha20-poly1305',
+    'none', 'plain',
+})
+
+_UUID_RE = re.compile(r'[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}')
+_REALITY_KEY_RE = re.compile(r'[A-Za-z0-9_-]{43}')   # X25519 key, base64url without padding
+_SHORT_ID_RE = re.compile(r'(?:[0-9a-fA-F]{2}){0,8}')
+
+
+def _b64decode(data: str) -> bytes:
+    """Decode standard or URL-safe base64, with or without padding."""
+    data = data.translate(str.maketrans('-_', '+/'))
+    return base64.b64decode(data + '=' * (-len(data) % 4), validate=True)
+
+
+def _host_port(netloc: str, default_port: Optional[int] = None) -> Tuple[str, int]:
+    """Split host:port (IPv6 in brackets) into address and port."""
+    if netloc.startswith('['):
+        parts = urllib.parse.urlsplit('//' + netloc)
+        host, port = parts.hostname or '', parts.port   # raises ValueError if not a number
     else:
-        name = "Shadowsocks Server"
-    
-    # Decode base64 if needed
-    if '@' not in url_part:
-        # Old format: ss://base64(method:password@server:port)
+        host, sep, port_text = netloc.rpartition(':')
+        if not sep:
+            host, port = netloc, None
+        elif not port_text.isdigit():
+            raise ValueError(f"Invalid port '{port_text}'")
+        else:
+            port = int(port_text)
+    if port is None:
+        port = default_port
+    if port is None:
+        raise ValueError("Missing port")
+    return host, port
+
+
+def _query_fields(query: str) -> Dict[str, str]:
+    """Link fields from a query string; the first non-empty value of a parameter wins."""
+    fields = {}
+    for pair in query.split('&'):
+        key, _, value = pair.partition('=')
+        field = QUERY_FIELDS.get(key)
+        if field and value and field not in fields:
+            if '%' in value or '+' in value:
+                value = urllib.parse.unquote_plus(value)
+            fields[field] = value
+    return fields
+
+
+def _parse_url_link(rest: str) -> Dict[str, Any]:
+    """user@host:port?query#name, as used by vless:// and trojan://."""
+    body, _, name = rest.partition('#')
+    body, _, query = body.partition('?')
+    user, at, netloc = body.rstrip('/').rpartition('@')
+    if not at:
+        raise ValueError("Missing user@ before the server")
+    server, port = _host_port(netloc, 443)
+    fields = _query_fields(query)
+    fields.update(server=server, port=port, user=urllib.parse.unquote(user))
+    if name:
+        fields['name'] = urllib.parse.unquote(name)
+    return fields
+
+
+def _parse_vless(rest: str) -> Dict[str, Any]:
+    fields = _parse_url_link(rest)
+    fields['user_id'] = fields.pop('user')
+    return fields
+
+
+def _parse_trojan(rest: str) -> Dict[str, Any]:
+    fields = _parse_url_link(rest)
+    fields['password'] = fields.pop('user')
+    return fields
+
+
+def _parse_shadowsocks(rest: str) -> Dict[str, Any]:
+    """SIP002 (userinfo@host:port) or legacy base64(method:password@host:port)."""
+    body, _, name = rest.partition('#')
+    body, _, query = body.partition('?')
+    body = body.rstrip('/')
+    if '@' not in body:
         try:
-            decoded = base64.b64decode(url_part).decode('utf-8')
-            if '@' in decoded:
-                method_password, server_port = decoded.split('@', 1)
-                if ':' in method_password:
-                    method, password = method_password.split(':', 1)
-                else:
-                    raise ValueError("Invalid format")
-            else:
-                raise ValueError("Invalid format")
-        except Exception:
-            raise ValueError("Invalid Shadowsocks URL format")
-    else:
-        # New format: ss://base64(method:password)@server:port
+            body = _b64decode(body).decode('utf-8')
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError("Invalid Shadowsocks URL format") from None
+    if 'plugin=' in query:
+        raise ValueError("Shadowsocks plugins are not supported")
+    userinfo, _, netloc = body.rpartition('@')
+    userinfo = urllib.parse.unquote(userinfo)
+    if ':' not in userinfo:
         try:
-            auth_part, server_port = url_part.split('@', 1)
-            decoded_auth = base64.b64decode(auth_part).decode('utf-8')
-            if ':' in decoded_auth:
-                method, password = decoded_auth.split(':', 1)
-            else:
-                raise ValueError("Invalid auth format")
-        except Exception:
-            raise ValueError("Invalid Shadowsocks URL format")
-    
-    # Parse server and port
-    if ':' in server_port:
-        server, port = server_port.rsplit(':', 1)
-        port = int(port)
-    else:
-        raise ValueError("Invalid server:port format")
-    
-    config = {
-        'server': server,
-        'port': port,
-        'method': method,
-        'password': password,
-        'name': name
-    }
-    
-    return config
+            userinfo = _b64decode(userinfo).decode('utf-8')
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError("Invalid Shadowsocks URL format") from None
+    method, sep, password = userinfo.partition(':')
+    if not sep:
+        raise ValueError("Invalid Shadowsocks URL format")
+    server, port = _host_port(netloc)
+    fields = {'server': server, 'port': port, 'method': method, 'password': password}
+    if name:
+        fields['name'] = urllib.parse.unquote(name)
+    return fields
 
 
-def create_xray_config_vless(vless_config: Dict[str, Any], proxy_port: int = 8080) -> Dict[str, Any]:
-    """Create Xray configuration for VLESS."""
-    
-    # Build stream settings
+def _parse_vmess(rest: str) -> Dict[str, Any]:
+    """base64 JSON in the v2rayN format."""
+    try:
+        data = json.loads(_b64decode(rest.partition('#')[0]))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid VMess link: not base64 JSON") from None
+    if not isinstance(data, dict):
+        raise ValueError("Invalid VMess link: not base64 JSON")
+    fields = {field: str(data[key]) for key, field in VMESS_FIELDS.items()
+              if data.get(key) not in (None, '')}
+    fields['port'] = int(fields.get('port', 0))
+    if fields.get('security') not in ('tls', 'reality'):
+        fields.pop('security', None)
+    return fields
+
+
+def _validate(link: Link) -> None:
+    if not link.server:
+        raise ValueError("Missing server address")
+    if not 0 < link.port < 65536:
+        raise ValueError(f"Port {link.port} is out of range")
+    if link.scheme in ('vless', 'vmess'):
+        # Xray also maps any 1-30 byte string to a UUID
+        if not (_UUID_RE.fullmatch(link.user_id) or 0 < len(link.user_id.encode()) <= 30):
+            raise ValueError(f"Invalid UUID '{link.user_id}'")
+    elif not link.password:
+        raise ValueError("Missing password")
+    if link.scheme == 'ss' and link.method not in SHADOWSOCKS_METHODS:
+        raise ValueError(f"Unsupported Shadowsocks method '{link.method}'")
+    if link.security == 'reality':
+        if not _REALITY_KEY_RE.fullmatch(link.pbk):
+            raise ValueError("REALITY public key (pbk) must be 43 base64url characters")
+        if not _SHORT_ID_RE.fullmatch(link.sid):
+            raise ValueError("REALITY short ID (sid) must be at most 16 hex digits, an even number")
+
+
+def create_stream_settings(link: Link) -> Dict[str, Any]:
+    """Transport and TLS/REALITY settings shared by vless, vmess and trojan outbounds."""
     stream_settings = {
-        "network": vless_config.get('type', 'tcp')
+        "network": link.type
     }
     
     # Security settings
-    security = vless_config.get('security', 'tls')
-    if security == 'tls':
+    if link.security == 'tls':
         stream_settings['security'] = 'tls'
         tls_settings = {}
-        if vless_config.get('sni'):
-            tls_settings['serverName'] = vless_config['sni']
-        if vless_config.get('alpn'):
-            tls_settings['alpn'] = vless_config['alpn'].split(',')
-        if vless_config.get('fp'):
-            tls_settings['fingerprint'] = vless_config['fp']
+        if link.sni:
+            tls_settings['serverName'] = link.sni
+        if link.alpn:
+            tls_settings['alpn'] = link.alpn.split(',')
+        if link.fp:
+            tls_settings['fingerprint'] = link.fp
         if tls_settings:
             stream_settings['tlsSettings'] = tls_settings
-    elif security == 'reality':
+    elif link.security == 'reality':
         stream_settings['security'] = 'reality'
         reality_settings = {}
-        if vless_config.get('sni'):
-            reality_settings['serverName'] = vless_config['sni']
-        if vless_config.get('fp'):
-            reality_settings['fingerprint'] = vless_config['fp']
+        if link.sni:
+            reality_settings['serverName'] = link.sni
+        if link.fp:
+            reality_settings['fingerprint'] = link.fp
         # Required fields for REALITY
-        if vless_config.get('pbk'):  # public key
-            reality_settings['publicKey'] = vless_config['pbk']
-        if vless_config.get('sid'):  # short ID
-            reality_settings['shortId'] = vless_config['sid']
+        reality_settings['publicKey'] = link.pbk
+        if link.sid:
+            reality_settings['shortId'] = link.sid
         # Set empty password if not provided (REALITY requirement)
-        reality_settings['password'] = vless_config.get('password', '')
-        # Always set realitySettings for reality security, even if minimal
+        reality_settings['password'] = link.reality_password
         stream_settings['realitySettings'] = reality_settings
     
     # Network-specific settings
-    network = vless_config.get('type', 'tcp')
-    if network == 'ws':
+    if link.type == 'ws':
         ws_settings = {}
-        if vless_config.get('path'):
-            ws_settings['path'] = vless_config['path']
-        if vless_config.get('host'):
-            ws_settings['headers'] = {'Host': vless_config['host']}
+        if link.path:
+            ws_settings['path'] = link.path
+        if link.host:
+            ws_settings['headers'] = {'Host': link.host}
         if ws_settings:
             stream_settings['wsSettings'] = ws_settings
-    elif network == 'grpc':
-        grpc_settings = {}
-        if vless_config.get('path'):
-            grpc_settings['serviceName'] = vless_config['path']
-        if grpc_settings:
-            stream_settings['grpcSettings'] = grpc_settings
-    elif network == 'h2':
+    elif link.type == 'grpc':
+        if link.path:
+            stream_settings['grpcSettings'] = {'serviceName': link.path}
+    elif link.type == 'h2':
         h2_settings = {}
-        if vless_config.get('path'):
-            h2_settings['path'] = vless_config['path']
-        if vless_config.get('host'):
-            h2_settings['host'] = [vless_config['host']]
+        if link.path:
+            h2_settings['path'] = link.path
+        if link.host:
+            h2_settings['host'] = [link.host]
         if h2_settings:
             stream_settings['httpSettings'] = h2_settings
     
-    # Build user configuration
+    return stream_settings
+
+
+def vless_settings(link: Link) -> Dict[str, Any]:
     user_config = {
-        "id": vless_config['user_id'],
-        "encryption": vless_config.get('encryption', 'none')
+        "id": link.user_id,
+        "encryption": link.encryption
     }
-    
-    if vless_config.get('flow'):
-        user_config['flow'] = vless_config['flow']
-    
-    config = {
+    if link.flow:
+        user_config['flow'] = link.flow
+    return {
+        "vnext": [
+            {
+                "address": link.server,
+                "port": link.port,
+                "users": [user_config]
+            }
+        ]
+    }
+
+
+def vmess_settings(link: Link) -> Dict[str, Any]:
+    return {
+        "vnext": [
+            {
+                "address": link.server,
+                "port": link.port,
+                "users": [{"id": link.user_id, "security": link.method or 'auto'}]
+            }
+        ]
+    }
+
+
+def trojan_settings(link: Link) -> Dict[str, Any]:
+    server = {
+        "address": link.server,
+        "port": link.port,
+        "password": link.password
+    }
+    if link.flow:
+        server['flow'] = link.flow
+    return {
+        "servers": [server]
+    }
+
+
+def shadowsocks_settings(link: Link) -> Dict[str, Any]:
+    return {
+        "servers": [
+            {
+                "address": link.server,
+                "port": link.port,
+                "method": link.method,
+                "password": link.password
+            }
+        ]
+    }
+
+
+class Scheme(NamedTuple):
+    label: str
+    parse: Callable[[str], Dict[str, Any]]          # text after '://' → Link fields
+    protocol: str
+    settings: Callable[[Link], Dict[str, Any]]      # outbound "settings"
+    stream: bool                                    # outbound has streamSettings
+    defaults: Dict[str, Any]
+
+
+SCHEMES = {
+    'vless': Scheme('VLESS', _parse_vless, 'vless', vless_settings, True, {'security': 'tls'}),
+    'vmess': Scheme('VMess', _parse_vmess, 'vmess', vmess_settings, True, {}),
+    'trojan': Scheme('Trojan', _parse_trojan, 'trojan', trojan_settings, True, {'security': 'tls'}),
+    'ss': Scheme('Shadowsocks', _parse_shadowsocks, 'shadowsocks', shadowsocks_settings, False, {}),
+}
+
+def base_config(proxy_port: int = 8080) -> Dict[str, Any]:
+    """The parts of a client configuration that do not depend on the servers.
+
+    Built afresh on every call, so the caller owns the result.
+    """
+    return {
         "log": {
             "loglevel": "warning"
         },
@@ -237,20 +395,6 @@ def create_xray_config_vless(vless_config: Dict[str, Any], proxy_port: int = 808
             }
         ],
         "outbounds": [
-            {
-                "tag": "vless-out",
-                "protocol": "vless",
-                "settings": {
-                    "vnext": [
-                        {
-                            "address": vless_config['server'],
-                            "port": vless_config['port'],
-                            "users": [user_config]
-                        }
-                    ]
-                },
-                "streamSettings": stream_settings
-            },
             {
                 "tag": "direct",
                 "protocol": "freedom"
@@ -270,102 +414,447 @@ def create_xray_config_vless(vless_config: Dict[str, Any], proxy_port: int = 808
             ]
         }
     }
-    
-    return config
 
 
-def create_xray_config_shadowsocks(ss_config: Dict[str, Any], proxy_port: int = 8080) -> Dict[str, Any]:
-    """Create Xray configuration for Shadowsocks."""
-    
-    config = {
-        "log": {
-            "loglevel": "warning"
+def merge(target: Dict[str, Any], fragment: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge fragment into target: dicts recursively, lists appended, the rest replaced.
+
+    Containers are copied on the way, so fragment and target share only leaves.
+    """
+    for key, value in fragment.items():
+        if isinstance(value, dict):
+            current = target.get(key)
+            target[key] = merge(dict(current) if isinstance(current, dict) else {}, value)
+        elif isinstance(value, list):
+            target[key] = list(target.get(key) or []) + value
+        else:
+            target[key] = value
+    return target
+
+
+class Preset(NamedTuple):
+    """Fragments a CLI preset merges into the configuration; see PRESETS."""
+    help: str
+    config: Dict[str, Any] = {}      # into the configuration
+    inbound: Dict[str, Any] = {}     # into every inbound
+    stream: Dict[str, Any] = {}      # into every server's streamSettings
+    outbound: Optional[Callable[[Link], Dict[str, Any]]] = None   # into each server outbound
+
+
+class ConfigBuilder:
+    """Assemble a client configuration from the shared base and per-server fragments.
+
+    Server outbounds come first, so the first one added carries all traffic
+    except private addresses unless a merged fragment routes it elsewhere.
+    """
+
+    def __init__(self, proxy_port: int = 8080):
+        self.proxy_port = proxy_port
+        self.outbounds: List[Dict[str, Any]] = []
+        self.fragments: List[Dict[str, Any]] = []
+        self.inbound_fragments: List[Dict[str, Any]] = []
+        self.stream_fragments: List[Dict[str, Any]] = []
+        self.outbound_fragments: List[Callable[[Link], Dict[str, Any]]] = []
+
+    def add_preset(self, preset: Preset) -> None:
+        """Apply preset to the configuration. Add presets before links."""
+        if preset.config:
+            self.fragments.append(preset.config)
+        if preset.inbound:
+            self.inbound_fragments.append(preset.inbound)
+        if preset.stream:
+            self.stream_fragments.append(preset.stream)
+        if preset.outbound:
+            self.outbound_fragments.append(preset.outbound)
+
+    def add_link(self, link: Link, tag: Optional[str] = None) -> Dict[str, Any]:
+        """Add the outbound for link (tagged '<scheme>-out' by default) and return it."""
+        spec = SCHEMES[link.scheme]
+        outbound = {
+            "tag": tag or f"{link.scheme}-out",
+            "protocol": spec.protocol,
+            "settings": spec.settings(link)
+        }
+        if spec.stream or self.stream_fragments:
+            stream = create_stream_settings(link) if spec.stream else {}
+            for fragment in self.stream_fragments:
+                stream = merge(stream, fragment)
+            outbound['streamSettings'] = stream
+        for fragment in self.outbound_fragments:
+            merge(outbound, fragment(link))
+        self.outbounds.append(outbound)
+        return outbound
+
+    def add_fragment(self, fragment: Dict[str, Any]) -> None:
+        """Merge fragment into the configuration when it is built."""
+        self.fragments.append(fragment)
+
+    def build(self) -> Dict[str, Any]:
+        config = base_config(self.proxy_port)
+        config['outbounds'] = self.outbounds + config['outbounds']
+        for inbound in config['inbounds']:
+            for fragment in self.inbound_fragments:
+                merge(inbound, fragment)
+        for fragment in self.fragments:
+            config = merge(config, fragment)
+        return config
+
+
+def _mux(link: Link) -> Dict[str, Any]:
+    if link.scheme == 'ss':
+        return {}
+    return {
+        "mux": {
+            "enabled": True,
+            # XTLS Vision carries TCP itself; only UDP goes over XUDP
+            "concurrency": -1 if link.flow.startswith('xtls-rprx-vision') else 8,
+            "xudpConcurrency": 16,
+            "xudpProxyUDP443": "reject"
+        }
+    }
+
+
+# Performance presets, applied in the order given on the command line
+PRESETS = {
+    'sniff': Preset(
+        "sniff HTTP/TLS/QUIC destinations for routing only (routeOnly) and "
+        "resolve domains that match no rule (domainStrategy IPIfNonMatch)",
+        config={"routing": {"domainStrategy": "IPIfNonMatch"}},
+        inbound={"sniffing": {"enabled": True, "destOverride": ["http", "tls", "quic"],
+                              "routeOnly": True}}),
+    'mux': Preset(
+        "multiplex TCP over up to 8 streams per connection and UDP over XUDP "
+        "(XUDP only for XTLS Vision servers)",
+        outbound=_mux),
+    'tfo': Preset(
+        "TCP Fast Open and keepalive (idle 300 s, every 30 s) on server connections",
+        stream={"sockopt": {"tcpFastOpen": True, "tcpKeepAliveIdle": 300,
+                            "tcpKeepAliveInterval": 30}}),
+    'throughput': Preset(
+        "1 MiB buffer per connection and longer idle timeouts",
+        config={"policy": {"levels": {"0": {"handshake": 8, "connIdle": 600, "uplinkOnly": 2,
+                                            "downlinkOnly": 5, "bufferSize": 1024}}}}),
+    'lowmem': Preset(
+        "4 KiB buffer per connection and short idle timeouts, for small devices",
+        config={"policy": {"levels": {"0": {"handshake": 4, "connIdle": 120, "uplinkOnly": 1,
+                                            "downlinkOnly": 1, "bufferSize": 4}}}}),
+}
+
+DOMAIN_STRATEGIES = ('AsIs', 'IPIfNonMatch', 'IPOnDemand')
+
+
+def to_json(config: Dict[str, Any], compact: bool = False) -> str:
+    """Serialise config: indented for reading, or compact for xray_config_base64."""
+    if compact:
+        return json.dumps(config, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(config, indent=2, ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_link(url: str) -> Link:
+    """Parse and validate a vless://, vmess://, trojan:// or ss:// link.
+
+    Results are cached: subscriptions often repeat the same server, and a
+    Link is immutable, so repeated links share one record.
+    """
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        raise ValueError("Not a link or base64 subscription")
+    spec = SCHEMES.get(scheme)
+    if spec is None:
+        raise ValueError(f"Unsupported scheme '{scheme}://'")
+    fields = dict(spec.defaults, name=f"{spec.label} Server")
+    fields.update(spec.parse(rest))
+    link = Link(scheme=scheme, **fields)
+    _validate(link)
+    return link
+
+
+def _subscription(blob: List[str], start: int) -> Iterator[Tuple[str, str]]:
+    """Yield (location, link) for each link in a base64 subscription."""
+    text = ''.join(blob)
+    try:
+        text = _b64decode(text).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError):
+        yield f"line {start}", text
+        return
+    entries = (line.strip() for line in text.splitlines())
+    for n, link in enumerate(filter(None, entries), 1):
+        yield f"line {start}, entry {n}", link
+
+
+def iter_links(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (location, link) for every link in lines, as they are read.
+
+    A line holding '://' is a link. Runs of other lines are a base64
+    subscription (possibly wrapped), decoded when the run ends. Blank lines
+    and lines starting with '#' are skipped.
+    """
+    blob: List[str] = []
+    start = 0
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith('#') and '://' not in line:
+            if not blob:
+                start = number
+            blob.append(line)
+            continue
+        if blob:
+            yield from _subscription(blob, start)
+            blob = []
+        if '://' in line and not line.startswith('#'):
+            yield f"line {number}", line
+    if blob:
+        yield from _subscription(blob, start)
+
+
+def _unique_tag(name: str, scheme: str, used: Set[str]) -> str:
+    """An outbound tag derived from the server name, unique among used.
+
+    Tags start with PROXY_TAG_PREFIX so one selector matches every server.
+    """
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '-', name).strip('-').lower() or scheme
+    base = PROXY_TAG_PREFIX + slug
+    tag, n = base, 1
+    while tag in used:
+        n += 1
+        tag = f"{base}-{n}"
+    used.add(tag)
+    return tag
+
+
+def parse_batch(lines: Iterable[str]) -> Tuple[List[Tuple[str, Link]], List[Tuple[str, str]]]:
+    """Parse every link in lines and give each server a unique tag.
+
+    Returns (servers, failures): (tag, link) pairs, and (location, error) for
+    links that could not be converted.
+    """
+    servers = []
+    failures = []
+    tags: Set[str] = set()
+    for where, url in iter_links(lines):
+        try:
+            link = parse_link(url)
+        except ValueError as e:
+            failures.append((where, str(e)))
+            continue
+        servers.append((_unique_tag(link.name, link.scheme, tags), link))
+    return servers, failures
+
+
+# Probing: measure handshake latency to each server and prefer the fastest
+
+def probe_target(link: Link) -> Tuple[str, int, Optional[str]]:
+    """(address, port, TLS server name or None) of a server."""
+    if link.scheme == 'ss' or link.security not in ('tls', 'reality'):
+        return link.server, link.port, None
+    return link.server, link.port, link.sni or link.server
+
+
+async def _handshake(ip: str, port: int, sni: Optional[str],
+                     context: Optional[ssl.SSLContext], timeout: float) -> float:
+    """Seconds to open a TCP connection to ip:port, and complete TLS if sni is set."""
+    start = time.perf_counter()
+    _, writer = await asyncio.wait_for(
+        asyncio.open_connection(ip, port, ssl=context if sni else None, server_hostname=sni),
+        timeout)
+    elapsed = time.perf_counter() - start
+    writer.close()
+    try:
+        await asyncio.wait_for(writer.wait_closed(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        pass
+    return elapsed
+
+
+async def _probe_all(targets: List[Tuple[str, int, Optional[str]]], concurrency: int,
+                     timeout: float, attempts: int) -> List[Optional[float]]:
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    # Only timing the handshake: REALITY servers present someone else's certificate
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+
+    async def probe(host: str, port: int, sni: Optional[str]) -> Optional[float]:
+        async with slots:
+            try:
+                infos = await asyncio.wait_for(
+                    loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+            except (OSError, asyncio.TimeoutError):
+                return None
+            ip = infos[0][4][0]  # resolve once so DNS is not part of the latency
+            best = None
+            for _ in range(attempts):
+                try:
+                    elapsed = await _handshake(ip, port, sni, context, timeout)
+                except asyncio.TimeoutError:
+                    break  # do not wait out the timeout again
+                except OSError:
+                    continue
+                best = elapsed if best is None else min(best, elapsed)
+            return best
+
+    return await asyncio.gather(*(probe(*target) for target in targets))
+
+
+def probe_links(links: List[Link], mode: str = 'tcp', concurrency: int = 32,
+                timeout: float = 3.0, attempts: int = 3) -> List[Optional[float]]:
+    """Handshake latency in seconds to each server, None if unreachable.
+
+    mode 'tcp' times the TCP connect; 'tls' also completes a TLS handshake
+    with servers that use TLS or REALITY. At most `concurrency` servers are
+    probed at once and the best of `attempts` handshakes is kept.
+    """
+    targets = []
+    for link in links:
+        host, port, sni = probe_target(link)
+        targets.append((host, port, sni if mode == 'tls' else None))
+    return asyncio.run(_probe_all(targets, concurrency, timeout, attempts))
+
+
+def rank(servers: List[Tuple[str, Link]],
+         latencies: List[Optional[float]]) -> List[Tuple[str, Link, Optional[float]]]:
+    """(tag, link, latency), fastest first; unreachable ones last, in input order."""
+    ranked = [(tag, link, latency) for (tag, link), latency in zip(servers, latencies)]
+    return sorted(ranked, key=lambda r: (r[2] is None, r[2] or 0.0))
+
+
+def balancer_fragment(fallback_tag: str, probe_url: str = PROBE_URL,
+                      interval: str = '1m') -> Dict[str, Any]:
+    """Route all traffic through a leastPing balancer over every server outbound.
+
+    Xray's observatory keeps measuring the servers while it runs; until it
+    has results, traffic goes to fallback_tag.
+    """
+    return {
+        "observatory": {
+            "subjectSelector": [PROXY_TAG_PREFIX],
+            "probeURL": probe_url,
+            "probeInterval": interval,
+            "enableConcurrency": True
         },
-        "inbounds": [
-            {
-                "tag": "http-in",
-                "port": proxy_port,
-                "protocol": "http",
-                "settings": {
-                    "auth": "noauth",
-                    "udp": False
-                }
-            },
-            {
-                "tag": "socks-in",
-                "listen": "0.0.0.0",
-                "port": 1080,
-                "protocol": "socks",
-                "settings": {
-                    "udp": True,
-                    "auth": "noauth"
-                }
-            }
-        ],
-        "outbounds": [
-            {
-                "tag": "ss-out",
-                "protocol": "shadowsocks",
-                "settings": {
-                    "servers": [
-                        {
-                            "address": ss_config['server'],
-                            "port": ss_config['port'],
-                            "method": ss_config['method'],
-                            "password": ss_config['password']
-                        }
-                    ]
-                }
-            },
-            {
-                "tag": "direct",
-                "protocol": "freedom"
-            },
-            {
-                "tag": "blocked",
-                "protocol": "blackhole"
-            }
-        ],
         "routing": {
+            "balancers": [
+                {
+                    "tag": BALANCER_TAG,
+                    "selector": [PROXY_TAG_PREFIX],
+                    "strategy": {"type": "leastPing"},
+                    "fallbackTag": fallback_tag
+                }
+            ],
             "rules": [
                 {
                     "type": "field",
-                    "ip": ["geoip:private"],
-                    "outboundTag": "direct"
+                    "network": "tcp,udp",
+                    "balancerTag": BALANCER_TAG
                 }
             ]
         }
     }
+
+
+def convert_single(url: str, builder: ConfigBuilder) -> None:
+    link = parse_link(url)
+    print(f"Parsing {SCHEMES[link.scheme].label} URL...", file=sys.stderr)
+    builder.add_link(link)
+
+
+def read_batch(args: argparse.Namespace, builder: ConfigBuilder) -> None:
+    """Add the servers in args.input ('-' for stdin), reporting failures on stderr."""
+    if args.input == '-':
+        servers, failures = parse_batch(sys.stdin)
+    else:
+        with open(args.input, encoding='utf-8') as f:
+            servers, failures = parse_batch(f)
     
-    return config
+    for where, error in failures:
+        print(f"Skipped {where}: {error}", file=sys.stderr)
+    print(f"Converted {len(servers)} links, {len(failures)} failed", file=sys.stderr)
+    if not servers:
+        print("Error: No links could be converted", file=sys.stderr)
+        sys.exit(1)
+    if not args.probe:
+        for tag, link in servers:
+            builder.add_link(link, tag)
+        return
+    
+    print(f"Probing {len(servers)} servers ({args.probe})...", file=sys.stderr)
+    latencies = probe_links([link for _, link in servers], args.probe,
+                            args.probe_concurrency, args.probe_timeout)
+    ranked = rank(servers, latencies)
+    for tag, _, latency in ranked:
+        shown = f"{latency * 1000:7.1f} ms" if latency is not None else "unreachable"
+        print(f"  {shown:>11}  {tag}", file=sys.stderr)
+    keep = [(tag, link) for tag, link, latency in ranked if latency is not None]
+    if keep:
+        keep = keep[:args.keep] if args.keep else keep
+    else:
+        print("Warning: no server answered; keeping all of them", file=sys.stderr)
+        keep = [(tag, link) for tag, link, _ in ranked]
+    for tag, link in keep:
+        builder.add_link(link, tag)
+    builder.add_fragment(balancer_fragment(keep[0][0], args.probe_url))
 
 
 def main():
-    parser = argparse.ArgumentParser(description='Convert VLESS/SS links to Xray configuration')
-    parser.add_argument('url', help='VLESS or Shadowsocks URL')
+    presets = '\n'.join(f"  {name:<11} {preset.help}" for name, preset in PRESETS.items())
+    parser = argparse.ArgumentParser(description='Convert VLESS/VMess/Trojan/SS links to Xray configuration',
+                                     epilog=f"presets:\n{presets}",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', nargs='?', help='VLESS, VMess, Trojan or Shadowsocks URL')
+    parser.add_argument('--input', '-i', metavar='FILE',
+                        help='Convert every link in FILE ("-" for stdin): one per line '
+                             'or a base64 subscription')
     parser.add_argument('--output', '-o', help='Output file (default: stdout)')
     parser.add_argument('--proxy-port', '-p', type=int, default=8080, 
                         help='HTTP proxy port (default: 8080)')
     parser.add_argument('--base64', '-b', action='store_true',
-                        help='Output base64 encoded configuration')
+                        help='Output base64 encoded configuration (compact JSON)')
+    parser.add_argument('--compact', '-c', action='store_true',
+                        help='Output JSON without indentation')
+    parser.add_argument('--preset', action='append', default=[], choices=list(PRESETS),
+                        help='Apply a performance preset (repeatable; see below)')
+    parser.add_argument('--domain-strategy', choices=DOMAIN_STRATEGIES,
+                        help='Routing domainStrategy (the sniff preset uses IPIfNonMatch)')
+    probe = parser.add_argument_group('probing (with --input)')
+    probe.add_argument('--probe', choices=['tcp', 'tls'],
+                       help='Measure handshake latency to every server, order them fastest first, '
+                            'drop unreachable ones and balance traffic with leastPing')
+    probe.add_argument('--probe-timeout', type=float, default=3.0,
+                       help='Seconds per handshake (default: 3)')
+    probe.add_argument('--probe-concurrency', type=int, default=32,
+                       help='Servers probed at once (default: 32)')
+    probe.add_argument('--keep', type=int, default=0,
+                       help='Keep only the N fastest servers (default: all that answered)')
+    probe.add_argument('--probe-url', default=PROBE_URL,
+                       help=f'URL the Xray observatory fetches to compare servers (default: {PROBE_URL})')
     
     args = parser.parse_args()
+    if (args.url is None) == (args.input is None):
+        parser.error('give either a URL or --input')
+    if args.probe and not args.input:
+        parser.error('--probe needs --input')
+    if args.probe_timeout <= 0:
+        parser.error('--probe-timeout must be positive')
+    if args.probe_concurrency < 1:
+        parser.error('--probe-concurrency must be at least 1')
+    if args.keep < 0:
+        parser.error('--keep must not be negative')
     
     try:
-        if args.url.startswith('vless://'):
-            print("Parsing VLESS URL...", file=sys.stderr)
-            vless_config = parse_vless_link(args.url)
-            xray_config = create_xray_config_vless(vless_config, args.proxy_port)
-        elif args.url.startswith('ss://'):
-            print("Parsing Shadowsocks URL...", file=sys.stderr)
-            ss_config = parse_shadowsocks_link(args.url)
-            xray_config = create_xray_config_shadowsocks(ss_config, args.proxy_port)
+        builder = ConfigBuilder(args.proxy_port)
+        for name in args.preset:
+            builder.add_preset(PRESETS[name])
+        if args.domain_strategy:
+            builder.add_fragment({"routing": {"domainStrategy": args.domain_strategy}})
+        if args.input:
+            read_batch(args, builder)
         else:
-            print("Error: Unsupported URL format. Only VLESS and Shadowsocks URLs are supported.", file=sys.stderr)
-            sys.exit(1)
+            convert_single(args.url, builder)
         
         # Convert to JSON
-        json_output = json.dumps(xray_config, indent=2, ensure_ascii=False)
+        json_output = to_json(builder.build(), compact=args.compact or args.base64)
         
         if args.base64:
             # Encode as base64
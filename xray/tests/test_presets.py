@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Tests for the performance presets of convert_links.py.
+
+Usage:
+    python -m unittest discover -s tests
+"""
+
+import base64
+import copy
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import convert_links  # noqa: E402
+
+SCRIPT = Path(convert_links.__file__)
+
+USER = '00000000-0000-0000-0000-000000000001'
+PBK = 'SbVKOEMjK0sIlbwg4akyBg5mL5KZwwB-ed4eEE7YnRc'
+VISION = (f"vless://{USER}@node1.example.com:443?encryption=none&security=reality"
+          f"&sni=www.example.org&fp=chrome&pbk={PBK}&sid=6ba85179e30d4fc2&type=tcp"
+          f"&flow=xtls-rprx-vision#Vision")
+VLESS_WS = (f"vless://{USER}@node2.example.com:443?encryption=none&security=tls"
+            f"&sni=cdn.example.com&type=ws&path=%2Fws#WebSocket")
+VMESS = "vmess://" + base64.b64encode(json.dumps({
+    "v": "2", "ps": "VMess", "add": "node3.example.com", "port": "443", "id": USER,
+    "aid": "0", "scy": "auto", "net": "tcp", "type": "none", "tls": "tls",
+}).encode()).decode()
+TROJAN = "trojan://secret@node4.example.com:443?security=tls&sni=cdn.example.com#Trojan"
+SS = ("ss://" + base64.urlsafe_b64encode(b"aes-256-gcm:secret").decode().rstrip('=')
+      + "@node5.example.com:8388#Shadowsocks")
+LINKS = [VISION, VLESS_WS, VMESS, TROJAN, SS]
+
+SNIFFING = {"enabled": True, "destOverride": ["http", "tls", "quic"], "routeOnly": True}
+SOCKOPT = {"tcpFastOpen": True, "tcpKeepAliveIdle": 300, "tcpKeepAliveInterval": 30}
+
+# The configuration for VISION alone, as generated before presets existed
+PLAIN_VISION = {
+    "log": {"loglevel": "warning"},
+    "inbounds": [
+        {"tag": "http-in", "port": 8080, "protocol": "http",
+         "settings": {"auth": "noauth", "udp": False}},
+        {"tag": "socks-in", "listen": "0.0.0.0", "port": 1080, "protocol": "socks",
+         "settings": {"udp": True, "auth": "noauth"}},
+    ],
+    "outbounds": [
+        {"tag": "vless-out", "protocol": "vless",
+         "settings": {"vnext": [{"address": "node1.example.com", "port": 443, "users": [
+             {"id": USER, "encryption": "none", "flow": "xtls-rprx-vision"}]}]},
+         "streamSettings": {"network": "tcp", "security": "reality", "realitySettings": {
+             "serverName": "www.example.org", "fingerprint": "chrome", "publicKey": PBK,
+             "shortId": "6ba85179e30d4fc2", "password": ""}}},
+        {"tag": "direct", "protocol": "freedom"},
+        {"tag": "blocked", "protocol": "blackhole"},
+    ],
+    "routing": {"rules": [
+        {"type": "field", "ip": ["geoip:private"], "outboundTag": "direct"},
+    ]},
+}
+
+
+def build(*presets, links=LINKS):
+    builder = convert_links.ConfigBuilder()
+    for name in presets:
+        builder.add_preset(convert_links.PRESETS[name])
+    servers, failures = convert_links.parse_batch(links)
+    assert not failures, failures
+    for tag, link in servers:
+        builder.add_link(link, tag)
+    return builder.build()
+
+
+def servers(config):
+    return [o for o in config['outbounds'] if o['tag'].startswith(convert_links.PROXY_TAG_PREFIX)]
+
+
+class NoPresetTest(unittest.TestCase):
+    def test_output_unchanged(self):
+        builder = convert_links.ConfigBuilder()
+        builder.add_link(convert_links.parse_link(VISION))
+        self.assertEqual(builder.build(), PLAIN_VISION)
+
+    def test_presets_leave_shared_parts_alone(self):
+        base = copy.deepcopy(convert_links.base_config(8080))
+        plain = build()
+        build(*convert_links.PRESETS)
+        self.assertEqual(convert_links.base_config(8080), base)
+        self.assertEqual(build(), plain)
+
+    def test_editing_a_build_leaves_later_builds_alone(self):
+        config = build()
+        config['log']['loglevel'] = 'debug'
+        config['routing']['rules'].clear()
+        config['inbounds'][0]['port'] = 1
+        self.assertEqual(build()['log'], {"loglevel": "warning"})
+        self.assertEqual(build()['inbounds'][0]['port'], 8080)
+        self.assertEqual(len(build()['routing']['rules']), 1)
+
+
+class SniffTest(unittest.TestCase):
+    def test_every_inbound_sniffs_for_routing_only(self):
+        config = build('sniff')
+        self.assertEqual(len(config['inbounds']), 2)
+        for inbound in config['inbounds']:
+            self.assertEqual(inbound['sniffing'], SNIFFING)
+
+    def test_domain_strategy(self):
+        config = build('sniff')
+        self.assertEqual(config['routing']['domainStrategy'], 'IPIfNonMatch')
+        self.assertEqual(config['routing']['rules'], build()['routing']['rules'])
+
+    def test_domain_strategy_option_overrides_preset(self):
+        out = subprocess.run([sys.executable, str(SCRIPT), VISION, '--preset', 'sniff',
+                              '--domain-strategy', 'AsIs'],
+                             capture_output=True, text=True, check=True)
+        config = json.loads(out.stdout)
+        self.assertEqual(config['routing']['domainStrategy'], 'AsIs')
+        self.assertEqual(config['inbounds'][0]['sniffing'], SNIFFING)
+
+    def test_outbounds_untouched(self):
+        self.assertEqual(build('sniff')['outbounds'], build()['outbounds'])
+
+
+class MuxTest(unittest.TestCase):
+    def test_mux_and_xudp(self):
+        for outbound in servers(build('mux')):
+            with self.subTest(outbound['tag']):
+                if outbound['protocol'] == 'shadowsocks':
+                    self.assertNotIn('mux', outbound)
+                    continue
+                mux = outbound['mux']
+                self.assertTrue(mux['enabled'])
+                self.assertEqual(mux['xudpConcurrency'], 16)
+                self.assertEqual(mux['xudpProxyUDP443'], 'reject')
+
+    def test_vision_multiplexes_only_udp(self):
+        by_tag = {o['tag']: o for o in servers(build('mux'))}
+        self.assertEqual(by_tag['proxy-vision']['mux']['concurrency'], -1)
+        self.assertEqual(by_tag['proxy-websocket']['mux']['concurrency'], 8)
+
+    def test_direct_outbounds_untouched(self):
+        config = build('mux')
+        self.assertEqual(config['outbounds'][-2:], build()['outbounds'][-2:])
+
+
+class SockoptTest(unittest.TestCase):
+    def test_every_server_gets_sockopt(self):
+        plain = servers(build())
+        for outbound, before in zip(servers(build('tfo')), plain):
+            with self.subTest(outbound['tag']):
+                stream = dict(outbound['streamSettings'])
+                self.assertEqual(stream.pop('sockopt'), SOCKOPT)
+                self.assertEqual(stream, before.get('streamSettings', {}))
+
+    def test_direct_outbounds_untouched(self):
+        for outbound in build('tfo')['outbounds'][-2:]:
+            self.assertNotIn('streamSettings', outbound)
+
+
+class PolicyTest(unittest.TestCase):
+    def test_throughput(self):
+        level = build('throughput')['policy']['levels']['0']
+        self.assertEqual(level['bufferSize'], 1024)
+        self.assertEqual(level['connIdle'], 600)
+
+    def test_lowmem(self):
+        level = build('lowmem')['policy']['levels']['0']
+        self.assertEqual(level['bufferSize'], 4)
+        self.assertEqual(level['connIdle'], 120)
+
+    def test_later_preset_wins(self):
+        config = build('throughput', 'lowmem')
+        self.assertEqual(config['policy']['levels']['0'],
+                         convert_links.PRESETS['lowmem'].config['policy']['levels']['0'])
+
+    def test_no_policy_without_preset(self):
+        self.assertNotIn('policy', build('sniff', 'mux', 'tfo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Tests for server probing in convert_links.py against local listeners.
+
+Listeners on 127.0.0.1 stand in for servers: TLS listeners that complete the
+handshake after a set delay, one that accepts connections but never answers
+the handshake, and a port nobody listens on. localhost.pem is a self-signed
+certificate and key for them; probes do not verify certificates.
+
+Usage:
+    python -m unittest discover -s tests
+"""
+
+import json
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import convert_links  # noqa: E402
+
+HERE = Path(__file__).resolve().parent
+SCRIPT = Path(convert_links.__file__)
+CERT = HERE / 'localhost.pem'
+
+
+class Listener(socketserver.ThreadingTCPServer):
+    """A TLS server on an ephemeral port that answers handshakes after `delay`.
+
+    With delay None it accepts connections and never sends anything.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(CERT)
+        self.stop = threading.Event()
+        super().__init__(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def close(self):
+        self.stop.set()
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: Listener
+
+    def handle(self):
+        if self.server.delay is None:
+            self.server.stop.wait()
+            return
+        time.sleep(self.server.delay)
+        try:
+            with self.server.context.wrap_socket(self.request, server_side=True) as tls:
+                tls.recv(1)
+        except OSError:
+            pass
+
+
+def closed_port():
+    """A local port with nothing listening on it."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def trojan(name, port):
+    return f"trojan://secret@127.0.0.1:{port}?security=tls&sni=localhost#{name}"
+
+
+class ProbeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fast = Listener(0.0)
+        cls.slow = Listener(0.3)
+        cls.silent = Listener(None)
+        cls.closed = closed_port()
+
+    @classmethod
+    def tearDownClass(cls):
+        for listener in (cls.fast, cls.slow, cls.silent):
+            listener.close()
+
+    def links(self, *names):
+        ports = {'fast': self.fast.port, 'slow': self.slow.port,
+                 'silent': self.silent.port, 'closed': self.closed}
+        return [convert_links.parse_link(trojan(name, ports[name])) for name in names]
+
+    def test_tcp_times_connect_only(self):
+        fast, slow, closed = convert_links.probe_links(
+            self.links('fast', 'slow', 'closed'), 'tcp', timeout=1.0)
+        self.assertIsNotNone(fast)
+        self.assertLess(slow, 0.3)
+        self.assertIsNone(closed)
+
+    def test_tls_times_handshake(self):
+        fast, slow = convert_links.probe_links(self.links('fast', 'slow'), 'tls', timeout=2.0,
+                                               attempts=1)
+        self.assertLess(fast, 0.3)
+        self.assertGreaterEqual(slow, 0.3)
+
+    def test_silent_server_times_out_once(self):
+        start = time.perf_counter()
+        silent, = convert_links.probe_links(self.links('silent'), 'tls', timeout=0.3)
+        self.assertIsNone(silent)
+        self.assertLess(time.perf_counter() - start, 0.9)  # not once per attempt
+
+    def test_probes_run_concurrently(self):
+        start = time.perf_counter()
+        latencies = convert_links.probe_links(self.links(*['slow'] * 4), 'tls', timeout=2.0,
+                                              attempts=1)
+        self.assertTrue(all(latencies))
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_rank(self):
+        links = self.links('closed', 'slow', 'fast')
+        servers = [(f"proxy-{n}", link) for n, link in enumerate(links)]
+        ranked = convert_links.rank(servers, convert_links.probe_links(links, 'tls',
+                                                                       timeout=2.0))
+        self.assertEqual([tag for tag, _, _ in ranked], ['proxy-2', 'proxy-1', 'proxy-0'])
+        self.assertIsNone(ranked[-1][2])
+
+
+class ProbeCommandTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fast = Listener(0.0)
+        cls.slow = Listener(0.3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fast.close()
+        cls.slow.close()
+
+    def run_script(self, *args, links=()):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(links) + '\n')
+        self.addCleanup(Path(f.name).unlink)
+        return subprocess.run([sys.executable, str(SCRIPT), '--input', f.name, *args],
+                              capture_output=True, text=True)
+
+    def test_keeps_fastest_behind_balancer(self):
+        links = [trojan('Slow', self.slow.port), trojan('Fast', self.fast.port),
+                 trojan('Gone', closed_port())]
+        out = self.run_script('--probe', 'tls', '--keep', '1', links=links)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        config = json.loads(out.stdout)
+        servers = [o['tag'] for o in config['outbounds'] if o['tag'].startswith('proxy-')]
+        self.assertEqual(servers, ['proxy-fast'])
+        balancer, = config['routing']['balancers']
+        self.assertEqual(balancer['fallbackTag'], 'proxy-fast')
+        self.assertEqual(balancer['strategy'], {'type': 'leastPing'})
+
+    def test_rejects_bad_arguments(self):
+        links = [trojan('Fast', self.fast.port)]
+        for args in (['--probe-concurrency', '0'], ['--keep', '-1'], ['--probe-timeout', '0']):
+            with self.subTest(args=args):
+                out = self.run_script('--probe', 'tcp', *args, links=links)
+                self.assertEqual(out.returncode, 2)
+                self.assertIn(args[0], out.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()